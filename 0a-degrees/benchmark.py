@@ -0,0 +1,146 @@
+"""
+Times degrees.py on a dataset and prints the results as JSON: data loading,
+shortest_path queries at every degree of separation, and queries between
+people who are not connected.
+
+usage ex. `python 0a-degrees/benchmark.py 0a-degrees/synthetic --compact`
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import degrees
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak memory is just left out there
+    resource = None
+
+
+def peak_memory():
+    """
+    Returns the peak resident memory of this process in bytes, or None.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def time_query(source, target):
+    """
+    Returns (path, seconds, explored) for one shortest_path call.
+    """
+    start = time.perf_counter()
+    path = degrees.shortest_path(source, target)
+    seconds = time.perf_counter() - start
+    return path, seconds, degrees.search_stats["explored"]
+
+
+def summarize(samples):
+    """
+    Returns summary statistics for a list of (seconds, explored) samples.
+    """
+    times = sorted(sample[0] for sample in samples)
+    explored = [sample[1] for sample in samples]
+    return {
+        "queries": len(samples),
+        "mean_seconds": sum(times) / len(times),
+        "median_seconds": times[len(times) // 2],
+        "max_seconds": times[-1],
+        "mean_explored": sum(explored) / len(explored),
+        "max_explored": max(explored)
+    }
+
+
+def layers(source):
+    """
+    Returns the people at each distance from the source, as a list of
+    lists starting with [source].
+    """
+    found = [[source]]
+    seen = {source}
+    while found[-1]:
+        next_layer = []
+        for person_id in found[-1]:
+            for _, neighbor_id in degrees.neighbors_for_person(person_id):
+                if neighbor_id not in seen:
+                    seen.add(neighbor_id)
+                    next_layer.append(neighbor_id)
+        found.append(next_layer)
+    return found[:-1]
+
+
+def run(directory, sources=20, unreachable=20, compact=False, cache=True,
+        seed=0):
+    """
+    Loads directory and runs the benchmark, returning a JSON-able report.
+    """
+    report = {"directory": directory, "compact": compact, "cache": cache}
+
+    start = time.perf_counter()
+    degrees.load_data(directory, compact=compact, cache=cache)
+    report["load"] = {
+        "seconds": time.perf_counter() - start,
+        "people": len(degrees.people),
+        "movies": len(degrees.movies),
+        "peak_bytes": peak_memory()
+    }
+
+    rng = random.Random(seed)
+    person_ids = list(degrees.people)
+
+    # random pairs are nearly all at the typical distance, so instead time
+    # one target from every layer around each sampled source
+    by_degrees = {}
+    for source in rng.sample(person_ids, min(sources, len(person_ids))):
+        for layer in layers(source)[1:]:
+            path, seconds, explored = time_query(source, rng.choice(layer))
+            by_degrees.setdefault(len(path), []).append((seconds, explored))
+    report["connected"] = {
+        str(distance): summarize(samples)
+        for distance, samples in sorted(by_degrees.items())
+    }
+
+    # pair people from the smallest components with everyone else
+    by_size = sorted(person_ids, key=degrees.component_size)
+    samples = []
+    attempts = 0
+    while len(samples) < unreachable and attempts < 100 * unreachable:
+        attempts += 1
+        source = by_size[rng.randrange(min(len(by_size), 100))]
+        target = rng.choice(person_ids)
+        if degrees.connected(source, target):
+            continue
+        _, seconds, explored = time_query(source, target)
+        samples.append((seconds, explored))
+    report["unreachable"] = summarize(samples) if samples else None
+
+    report["peak_bytes"] = peak_memory()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark degrees.py.")
+    parser.add_argument("directory")
+    parser.add_argument("--sources", type=int, default=20,
+                        help="number of random sources, each timed against "
+                             "one target per degree of separation")
+    parser.add_argument("--unreachable", type=int, default=20,
+                        help="number of unreachable pairs to time")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    report = run(args.directory, args.sources, args.unreachable,
+                 args.compact, not args.no_cache, args.seed)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
+import argparse
 import csv
+import json
+import multiprocessing
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import CompactGraph, MoviesView, NamesView, PeopleView, csv_stamp
+from landmarks import LandmarkIndex, OutOfDate
+from nameindex import NameIndex
+from util import DisjointSet, Node, IndexedQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +18,61 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph holding the data when loaded with compact=True, else None
+graph = None
 
-def load_data(directory):
+# LandmarkIndex set by load_landmarks, else None
+landmarks = None
+
+# csv_stamp of the loaded data directory, so indexes built from other data
+# are noticed
+data_stamp = None
+
+# NameIndex over every person's name, built by load_data
+name_index = None
+
+# Ways person_id_for_name can resolve a name shared by several people
+POLICIES = ("ask", "most-connected", "none")
+
+# Counters from the most recent search, "explored" is the number of
+# people whose neighbors were expanded
+search_stats = {"explored": 0}
+
+# Maps person_ids to the label of their connected component
+components = {}
+
+# Maps component labels to the number of people in the component
+component_sizes = {}
+
+
+def load_data(directory, compact=False, cache=True):
     """
     Load data from CSV files into memory.
+
+    With compact=True the data is loaded into an integer indexed
+    CompactGraph instead, and names, people and movies become read only
+    views over it. The compact graph is cached as a binary snapshot next
+    to the CSV files, and reused while the CSV files are unchanged unless
+    cache is False.
+
+    Either way, people are labelled with their connected component
+    (see connected and component_size).
     """
+    global graph, names, people, movies, name_index, data_stamp
+    data_stamp = csv_stamp(directory)
+    if compact:
+        graph = CompactGraph.from_directory(directory, cache=cache)
+        names = NamesView(graph)
+        people = PeopleView(graph)
+        movies = MoviesView(graph)
+        name_index = NameIndex.from_graph(graph)
+        return
+
+    # switching back from a compact graph, start over with plain dicts
+    if graph is not None:
+        graph = None
+        names, people, movies = {}, {}, {}
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,48 +107,219 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    label_components()
+    name_index = NameIndex.build(people)
+
+
+def label_components():
+    """
+    Labels every person with their connected component, using union-find
+    over the stars of each movie, so unreachable pairs are known up front.
+    """
+    disjoint_set = DisjointSet()
+    for person_id in people:
+        disjoint_set.add(person_id)
+    for movie in movies.values():
+        stars = iter(movie["stars"])
+        first = next(stars, None)
+        for person_id in stars:
+            disjoint_set.union(first, person_id)
+
+    components.clear()
+    component_sizes.clear()
+    for person_id in people:
+        label = disjoint_set.find(person_id)
+        components[person_id] = label
+        component_sizes[label] = disjoint_set.sizes[label]
+
+
+def connected(source, target):
+    """
+    Returns True if the two person_ids are in the same connected component.
+    """
+    if graph is not None:
+        return graph.connected_ids(source, target)
+    return components[source] == components[target]
+
+
+def component_size(person_id):
+    """
+    Returns the number of people in a person's connected component,
+    including the person.
+    """
+    if graph is not None:
+        return graph.component_size_id(person_id)
+    return component_sizes[components[person_id]]
+
+
+def load_landmarks(path, count=32):
+    """
+    Loads the landmark index at path, building it from the loaded data
+    (and saving it to path) if the file does not exist yet or was built
+    from other data.
+    """
+    global landmarks
+    try:
+        landmarks = LandmarkIndex.load(path, people, graph, data_stamp)
+        return
+    except (FileNotFoundError, OutOfDate):
+        pass
+    landmarks = LandmarkIndex.build(people, neighbors_for_person, count,
+                                    graph, data_stamp)
+    try:
+        landmarks.save(path)
+    except OSError:
+        # nowhere to save it, the index is still used for this run
+        pass
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two actors.")
     # modified file pathing from original file to allow file to be ran from root folder
-    directory = sys.argv[1] if len(sys.argv) == 2 else "0a-degrees/large"
+    parser.add_argument("directory", nargs="?", default="0a-degrees/large")
+    parser.add_argument("--compact", action="store_true",
+                        help="load the data into a compact integer graph")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the compact graph snapshot")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer tab separated source/target name pairs "
+                             "from FILE (- for stdin) as JSON lines")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes used by --batch")
+    parser.add_argument("--policy", choices=POLICIES,
+                        help="how to resolve names shared by several people "
+                             "(default: ask, or none with --batch)")
+    parser.add_argument("--fuzzy", action="store_true",
+                        help="fall back to the closest name when a name "
+                             "has no exact match")
+    parser.add_argument("--all-paths", type=int, metavar="N",
+                        help="count every shortest path and print up to N "
+                             "of them")
+    parser.add_argument("--landmarks", metavar="FILE",
+                        help="landmark distance index to use (built and "
+                             "saved to FILE if it does not exist or is out "
+                             "of date)")
+    parser.add_argument("--estimate", action="store_true",
+                        help="only print landmark bounds on the degrees "
+                             "of separation, requires --landmarks")
+    args = parser.parse_args()
+    if args.estimate and not args.landmarks:
+        parser.error("--estimate requires --landmarks")
+    if args.batch and args.policy == "ask":
+        parser.error("--batch cannot ask which person is intended")
+    policy = args.policy or ("none" if args.batch else "ask")
+
+    # in batch mode stdout is reserved for the JSON results
+    log = sys.stderr if args.batch else sys.stdout
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
-
-    source = person_id_for_name(input("Name: "))
+    print("Loading data...", file=log)
+    load_data(args.directory, compact=args.compact, cache=not args.no_cache)
+    print("Data loaded.", file=log)
+
+    if args.landmarks:
+        print("Loading landmarks...", file=log)
+        load_landmarks(args.landmarks)
+        print("Landmarks loaded.", file=log)
+
+    if args.batch:
+        if args.batch == "-":
+            pairs = read_pairs(sys.stdin)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                pairs = read_pairs(f)
+        for result in batch_paths(pairs, workers=args.workers,
+                                  initargs=(args.directory, args.compact,
+                                            not args.no_cache),
+                                  policy=policy, fuzzy=args.fuzzy):
+            print(json.dumps(result), flush=True)
+        return
+
+    source = person_id_for_name(input("Name: "), policy, args.fuzzy)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), policy, args.fuzzy)
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if args.estimate:
+        bounds = landmarks.bounds(source, target, connected)
+        if bounds is None:
+            print("Not connected.")
+        elif bounds[1] is None:
+            print(f"At least {bounds[0]} degrees of separation.")
+        else:
+            print(f"{bounds[0]} to {bounds[1]} degrees of separation.")
+        return
+
+    if args.all_paths is not None:
+        # one search answers both the count and the paths
+        layers = _layered_search(source, target)
+        counted = count_shortest_paths(source, target, layers=layers)
+        if counted is None:
+            print("Not connected.")
+            return
+        degrees, count = counted
+        print(f"{degrees} degrees of separation, {count} shortest paths.")
+        for path in all_shortest_paths(source, target, limit=args.all_paths,
+                                       layers=layers):
+            print()
+            print_path(source, path)
+        return
+
+    if landmarks is not None:
+        path = landmarks.shortest_path(source, target, neighbors_for_person,
+                                       connected)
+    else:
+        path = shortest_path(source, target)
 
     if path is None:
         print("Not connected.")
     else:
         degrees = len(path)
         print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print_path(source, path)
 
 
-def shortest_path(source, target):
+def print_path(source, path):
+    """
+    Prints each step of a list of (movie_id, person_id) pairs from source.
+    """
+    path = [(None, source)] + path
+    for i in range(len(path) - 1):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+
+
+def shortest_path(source, target, bidirectional=True):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    By default the search grows from both ends at once (see
+    bidirectional_shortest_path), pass bidirectional=False to use
+    a single breadth first search from the source.
+
+    When the data was loaded with compact=True, the search always runs
+    bidirectionally over the CompactGraph's integer indices.
 
     If no possible path, returns None.
     """
+    search_stats["explored"] = 0
+    if graph is not None:
+        path = graph.shortest_path_ids(source, target)
+        search_stats["explored"] = graph.explored
+        return path
+
+    # people in different components can never be reached, skip the search
+    if not connected(source, target):
+        return None
+    if bidirectional:
+        return bidirectional_shortest_path(source, target)
+
     # solution heavily based on code used in lecture to solve the maze puzzle
     # solution usilizes Queue Frontier (breadth first search)
 
@@ -106,7 +333,7 @@ def shortest_path(source, target):
 
     # Initialize frontier to just the starting position
     start = Node(state=(None, source), parent=None, action=None)
-    frontier = QueueFrontier()
+    frontier = IndexedQueueFrontier()
     frontier.add(start)
 
     # Initialize an empty explored set
@@ -122,6 +349,7 @@ def shortest_path(source, target):
         # Choose a node from the frontier
         node = frontier.remove()
         num_explored += 1
+        search_stats["explored"] = num_explored
 
         # Mark node as explored
         explored.add(node.state[1])
@@ -147,15 +375,385 @@ def shortest_path(source, target):
                 frontier.add(child)
 
 
-def person_id_for_name(name):
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using a breadth first search
+    that grows from both the source and the target.
+
+    Each step expands one full level of whichever frontier is smaller,
+    and the two halves of the path are spliced together at the first
+    person reached by both searches.
+
+    If no possible path, returns None.
+    """
+    # same convention as shortest_path, no path from a person to themself
+    if source == target:
+        return None
+
+    # map each reached person to the (movie_id, person_id) step that reached
+    # them, from the source side the step points back towards the source,
+    # from the target side it points forward towards the target
+    forward_parents = {source: None}
+    backward_parents = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # always grow the smaller side, keeps both searches shallow
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = _expand_level(
+                forward_frontier, forward_parents, backward_parents)
+        else:
+            backward_frontier, meeting = _expand_level(
+                backward_frontier, backward_parents, forward_parents)
+
+        if meeting is not None:
+            return _splice_path(meeting, forward_parents, backward_parents)
+
+    # one side ran out of people to explore, so they are not connected
+    return None
+
+
+def _expand_level(frontier, parents, other_parents):
+    """
+    Expands every person in frontier by one step, recording how each new
+    person was reached in parents.
+
+    Returns the next frontier, and the first person that was already
+    reached by the other search (or None if the searches did not meet).
+    """
+    next_frontier = []
+    for person_id in frontier:
+        search_stats["explored"] += 1
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id in parents:
+                continue
+            parents[neighbor_id] = (movie_id, person_id)
+            if neighbor_id in other_parents:
+                return next_frontier, neighbor_id
+            next_frontier.append(neighbor_id)
+    return next_frontier, None
+
+
+def _splice_path(meeting, forward_parents, backward_parents):
+    """
+    Joins the source half and target half of a bidirectional search
+    at the meeting person into a list of (movie_id, person_id) pairs.
+    """
+    # walk back from the meeting person to the source
+    path = []
+    person_id = meeting
+    while forward_parents[person_id] is not None:
+        movie_id, parent_id = forward_parents[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    # then walk forward from the meeting person to the target
+    person_id = meeting
+    while backward_parents[person_id] is not None:
+        movie_id, next_id = backward_parents[person_id]
+        path.append((movie_id, next_id))
+        person_id = next_id
+    return path
+
+
+def shortest_path_tree(source, targets):
+    """
+    Returns a dict mapping each person_id in targets to the shortest list
+    of (movie_id, person_id) pairs that connect the source to it, or to
+    None if there is no such path.
+
+    A single breadth first search from the source answers every target,
+    it stops as soon as the last target has been reached.
+    """
+    search_stats["explored"] = 0
+    if graph is not None:
+        paths = graph.shortest_path_tree_ids(source, targets)
+        search_stats["explored"] = graph.explored
+        return paths
+
+    remaining = {target for target in targets
+                 if target != source and connected(source, target)}
+    parents = {source: None}
+    frontier = [source]
+    while frontier and remaining:
+        next_frontier = []
+        for person_id in frontier:
+            search_stats["explored"] += 1
+            for movie_id, neighbor_id in neighbors_for_person(person_id):
+                if neighbor_id not in parents:
+                    parents[neighbor_id] = (movie_id, person_id)
+                    remaining.discard(neighbor_id)
+                    next_frontier.append(neighbor_id)
+        frontier = next_frontier
+
+    paths = {}
+    for target in targets:
+        if target == source or target not in parents:
+            paths[target] = None
+            continue
+        path = []
+        person_id = target
+        while parents[person_id] is not None:
+            movie_id, parent_id = parents[person_id]
+            path.append((movie_id, person_id))
+            person_id = parent_id
+        path.reverse()
+        paths[target] = path
+    return paths
+
+
+def count_shortest_paths(source, target, layers=None):
+    """
+    Returns (degrees, count) where count is the number of distinct shortest
+    lists of (movie_id, person_id) pairs connecting the source to the
+    target, or None if there is no path.
+
+    Paths are counted without listing them, so count may be astronomically
+    large on the full dataset. layers can pass in the result of an earlier
+    _layered_search from source to target to skip the search.
+    """
+    if layers is None:
+        layers = _layered_search(source, target)
+    if layers is None:
+        return None
+    depths, counts = layers
+    return depths[target], counts[target]
+
+
+def all_shortest_paths(source, target, limit=None, layers=None):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs connecting
+    the source to the target, stopping after limit paths if it is given.
+
+    Paths are built lazily by walking back from the target through people
+    one layer closer to the source, so only the first few paths cost
+    anything. layers can pass in the result of an earlier _layered_search
+    from source to target to skip the search.
+    """
+    if layers is None:
+        layers = _layered_search(source, target)
+    if layers is None or limit == 0:
+        return
+    depths, _ = layers
+
+    # maps people to their sorted (movie_id, person_id) neighbors one layer
+    # closer to the source, shared by every path through them
+    closer = {}
+
+    def walk(person_id, suffix):
+        """
+        Yields the paths from source to person_id, followed by suffix.
+        """
+        depth = depths[person_id]
+        if depth == 0:
+            yield suffix
+            return
+        if person_id not in closer:
+            closer[person_id] = sorted(
+                (movie_id, neighbor_id)
+                for movie_id, neighbor_id in neighbors_for_person(person_id)
+                if depths.get(neighbor_id) == depth - 1)
+        for movie_id, neighbor_id in closer[person_id]:
+            yield from walk(neighbor_id, [(movie_id, person_id)] + suffix)
+
+    for count, path in enumerate(walk(target, []), start=1):
+        yield path
+        if count == limit:
+            return
+
+
+def _layered_search(source, target):
+    """
+    Breadth first search from the source that finishes the layer in which
+    the target is reached.
+
+    Returns (depths, counts) dicts, mapping each reached person to their
+    distance from the source and to their number of shortest paths from
+    the source, or None if the target cannot be reached.
+    """
+    if source == target or not connected(source, target):
+        return None
+
+    depths = {source: 0}
+    counts = {source: 1}
+    frontier = [source]
+    depth = 0
+    while frontier and target not in depths:
+        depth += 1
+        next_frontier = []
+        for person_id in frontier:
+            for _, neighbor_id in neighbors_for_person(person_id):
+                neighbor_depth = depths.get(neighbor_id)
+                if neighbor_depth is None:
+                    depths[neighbor_id] = depth
+                    counts[neighbor_id] = counts[person_id]
+                    next_frontier.append(neighbor_id)
+                elif neighbor_depth == depth:
+                    counts[neighbor_id] += counts[person_id]
+        frontier = next_frontier
+
+    if target not in depths:
+        return None
+    return depths, counts
+
+
+def read_pairs(lines):
+    """
+    Returns (source name, target name) pairs from tab separated lines,
+    skipping blank lines.
+    """
+    pairs = []
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        fields = line.split("\t")
+        if len(fields) != 2:
+            raise ValueError(f"line {number}: expected 'source<TAB>target'")
+        pairs.append((fields[0].strip(), fields[1].strip()))
+    return pairs
+
+
+def batch_paths(pairs, workers=1, initargs=None, policy="none", fuzzy=False):
+    """
+    Yields one result dict per (source name, target name) pair.
+
+    Pairs are grouped by source so one shortest_path_tree answers every
+    target of that source, and groups are spread over a process pool when
+    workers is more than 1. Results are yielded as soon as each group is
+    done, so they are not necessarily in input order.
+
+    initargs are the load_data arguments, workers that do not inherit the
+    loaded data (i.e. not forked) use them to load it themselves.
+
+    Names are resolved with the non interactive policy and fuzzy options
+    of person_id_for_name.
+    """
+    if policy == "ask":
+        raise ValueError("batch queries cannot ask which person is intended")
+
+    groups = {}
+    for source_name, target_name in pairs:
+        groups.setdefault(source_name, []).append(target_name)
+    groups = [(source_name, target_names, policy, fuzzy)
+              for source_name, target_names in groups.items()]
+
+    if workers <= 1:
+        for group in groups:
+            yield from _answer_group(group)
+        return
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(workers, initializer=_init_worker,
+                      initargs=initargs or ()) as pool:
+        for results in pool.imap_unordered(_answer_group_list, groups):
+            yield from results
+
+
+def _init_worker(directory=None, compact=False, cache=True):
+    """
+    Loads the data in a pool worker, unless it was inherited from the parent.
+    """
+    if not people and directory is not None:
+        load_data(directory, compact=compact, cache=cache)
+
+
+def _answer_group_list(group):
+    return list(_answer_group(group))
+
+
+def _answer_group(group):
+    """
+    Yields the result dicts for one source name and its target names.
+    """
+    source_name, target_names, policy, fuzzy = group
+    source = _resolve_name(source_name, policy, fuzzy)
+    targets = {name: _resolve_name(name, policy, fuzzy)
+               for name in target_names}
+    found = [target for target in targets.values() if isinstance(target, str)]
+    if isinstance(source, str):
+        paths = shortest_path_tree(source, found)
+
+    for target_name in target_names:
+        result = {"source": source_name, "target": target_name}
+        target = targets[target_name]
+        for role, person in (("source", source), ("target", target)):
+            if isinstance(person, list):
+                result["error"] = (f"{role} not found" if not person
+                                   else f"{role} is ambiguous")
+                result["candidates"] = person
+                break
+        else:
+            path = paths[target]
+            result["source_id"] = source
+            result["target_id"] = target
+            result["degrees"] = None if path is None else len(path)
+            result["path"] = path
+        yield result
+
+
+def _resolve_name(name, policy, fuzzy):
+    """
+    Returns the person_id for a name, or the list of matching person_ids
+    (empty if none) when the policy cannot pick exactly one person.
+    """
+    person_id = person_id_for_name(name, policy=policy, fuzzy=fuzzy)
+    if person_id is not None:
+        return person_id
+    return sorted(candidates_for_name(name, fuzzy=fuzzy))
+
+
+def candidates_for_name(name, fuzzy=False):
+    """
+    Returns the person_ids named name, ignoring case. If there are none and
+    fuzzy is True, returns the person_ids with the most similar name instead.
+    """
+    person_ids = name_index.exact(name)
+    if not person_ids and fuzzy:
+        matches = name_index.fuzzy(name, limit=1)
+        if matches:
+            person_ids = matches[0][2]
+    return person_ids
+
+
+def most_connected(person_ids):
+    """
+    Returns the person_id that starred in the most movies,
+    ties going to the lowest id.
+    """
+    return min(person_ids,
+               key=lambda person_id: (-len(people[person_id]["movies"]),
+                                      person_id))
+
+
+def person_id_for_name(name, policy="ask", fuzzy=False):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    policy decides what happens when several people share the name:
+    "ask" prompts for the intended id, "most-connected" picks the one who
+    starred in the most movies, and "none" gives up and returns None.
+    With fuzzy=True, a name with no exact match falls back to the closest
+    matching name.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    if policy not in POLICIES:
+        raise ValueError(f"unknown policy {policy!r}")
+    person_ids = candidates_for_name(name, fuzzy=fuzzy)
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
+        if policy == "most-connected":
+            return most_connected(person_ids)
+        if policy == "none":
+            return None
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
@@ -178,6 +776,8 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,122 @@
+"""
+Writes a synthetic people.csv, movies.csv and stars.csv dataset in the same
+format as the small and large directories, for benchmarking degrees.py.
+
+usage ex. `python 0a-degrees/generate.py 0a-degrees/synthetic --people 100000 --movies 20000`
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import random
+
+SYLLABLES = ["al", "an", "ar", "be", "da", "el", "en", "ha", "is", "ka",
+             "la", "li", "ma", "mo", "na", "ne", "ra", "ri", "sa", "ta",
+             "to", "va", "vi", "yo", "za"]
+
+
+def generate(directory, num_people, num_movies, cast_size=8, exponent=1.0,
+             isolated=0.01, seed=0):
+    """
+    Writes a synthetic dataset to directory.
+
+    Each movie gets a cast of roughly cast_size people. How often a person is
+    cast follows a power law over their rank, weight (rank + 1) ** -exponent,
+    so exponent 0 gives uniform degrees and larger exponents a few very well
+    connected people. Like in IMDb every person stars in at least one movie,
+    people the power law never picks are added to casts as needed. A
+    fraction isolated of the people are kept out of the shared pool and only
+    appear in small movies among themselves, so the data has unreachable
+    pairs and tiny components as well.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    person_ids = [str(100 + i) for i in range(num_people)]
+    movie_ids = [str(1000000 + i) for i in range(num_movies)]
+
+    num_isolated = int(num_people * isolated)
+    pool = person_ids[num_isolated:]
+    loners = person_ids[:num_isolated]
+    cumulative = list(itertools.accumulate(
+        (rank + 1) ** -exponent for rank in range(len(pool))))
+    rng.shuffle(pool)
+
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "name", "birth"])
+        for person_id in person_ids:
+            writer.writerow([person_id, _name(rng), rng.randint(1900, 2005)])
+
+    # set aside enough movies to give every loner a small cast of their own
+    num_small = min(num_movies, (num_isolated + 1) // 2)
+
+    # pool people still waiting for a guaranteed role, least likely to be
+    # picked last so they are popped first, and the people cast so far
+    waiting = list(pool)
+    cast_before = set()
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as f, \
+            open(os.path.join(directory, "stars.csv"), "w",
+                 encoding="utf-8", newline="") as g:
+        movies_writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        stars_writer = csv.writer(g)
+        movies_writer.writerow(["id", "title", "year"])
+        stars_writer.writerow(["person_id", "movie_id"])
+        for i, movie_id in enumerate(movie_ids):
+            movies_writer.writerow(
+                [movie_id, _title(rng), rng.randint(1920, 2020)])
+            if i < num_small:
+                cast = loners[2 * i:2 * i + 2]
+            elif pool:
+                size = max(1, int(rng.expovariate(1 / cast_size)))
+                cast = set(rng.choices(pool, cum_weights=cumulative, k=size))
+                cast_before.update(cast)
+                # spread the waiting people over the remaining movies, so
+                # the last one takes whoever is left
+                for _ in range(-(-len(waiting) // (num_movies - i))):
+                    person_id = waiting.pop()
+                    if person_id not in cast_before:
+                        cast.add(person_id)
+                        cast_before.add(person_id)
+            else:
+                cast = []
+            for person_id in cast:
+                stars_writer.writerow([person_id, movie_id])
+
+
+def _name(rng):
+    first = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 3))).capitalize()
+    last = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).capitalize()
+    return f"{first} {last}"
+
+
+def _title(rng):
+    words = ["".join(rng.choices(SYLLABLES, k=rng.randint(1, 3))).capitalize()
+             for _ in range(rng.randint(1, 4))]
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic degrees dataset.")
+    parser.add_argument("directory")
+    parser.add_argument("--people", type=int, default=10000)
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--cast-size", type=float, default=8,
+                        help="mean number of stars per movie")
+    parser.add_argument("--exponent", type=float, default=1.0,
+                        help="power law exponent of how often people are "
+                             "cast, 0 for uniform")
+    parser.add_argument("--isolated", type=float, default=0.01,
+                        help="fraction of people kept in tiny components")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.directory, args.people, args.movies, args.cast_size,
+             args.exponent, args.isolated, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,707 @@
+import csv
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, Sequence
+
+from trigrams import Postings
+
+# First bytes of every snapshot file, bump the version when the layout changes
+SNAPSHOT_MAGIC = b"DEGSNAP3"
+
+# Name of the snapshot file written next to the CSV files
+SNAPSHOT_NAME = "degrees.snapshot"
+
+# Attributes of a CompactGraph stored in a snapshot, in file order
+INT_SECTIONS = ("person_offsets", "person_movies", "movie_offsets",
+                "movie_stars", "name_order", "components",
+                "component_sizes", "gram_offsets", "gram_positions",
+                "gram_counts")
+STRING_SECTIONS = ("person_ids", "person_names", "person_births",
+                   "movie_ids", "movie_titles", "movie_years", "grams")
+
+
+class CompactGraph():
+    """
+    Co-star graph with people and movies interned to dense integers.
+
+    People and movies are numbered in order of their sorted IMDB ids, so an
+    id is translated to its index with a binary search. The graph itself is
+    stored CSR style: the movies of person p are
+    person_movies[person_offsets[p]:person_offsets[p + 1]], and the stars of
+    movie m are movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 name_order, components, component_sizes,
+                 grams, gram_offsets, gram_positions, gram_counts):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # person indices sorted by lower cased name, for name lookups
+        self.name_order = name_order
+
+        # components[p] is the label of the connected component of person p,
+        # component_sizes[label] the number of people in that component
+        self.components = components
+        self.component_sizes = component_sizes
+
+        # trigram postings of the names in name order, see trigrams.Postings
+        self.grams = grams
+        self.gram_offsets = gram_offsets
+        self.gram_positions = gram_positions
+        self.gram_counts = gram_counts
+
+        # number of people expanded by the most recent search
+        self.explored = 0
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Builds a compact graph from the people, movies and stars CSV files.
+        """
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            people = sorted(
+                (row["id"], row["name"], row["birth"])
+                for row in csv.DictReader(f)
+            )
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            movies = sorted(
+                (row["id"], row["title"], row["year"])
+                for row in csv.DictReader(f)
+            )
+        person_ids = [row[0] for row in people]
+        movie_ids = [row[0] for row in movies]
+
+        # temporary lookup tables, only needed while reading stars
+        person_lookup = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_lookup = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        # encode each (person, movie) pair as a single int, the set drops
+        # duplicate rows just like the sets used by load_data
+        pairs = set()
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    person = person_lookup[row["person_id"]]
+                    movie = movie_lookup[row["movie_id"]]
+                except KeyError:
+                    continue
+                pairs.add(person * len(movie_ids) + movie)
+        del person_lookup, movie_lookup
+
+        person_offsets, person_movies, movie_offsets, movie_stars = build_csr(
+            sorted(pairs), len(person_ids), len(movie_ids))
+
+        components, component_sizes = label_components(
+            len(person_ids), movie_offsets, movie_stars)
+
+        names = [row[1] for row in people]
+        name_order = array("i", sorted(
+            range(len(people)), key=lambda i: (names[i].lower(), i)))
+        postings = Postings.build([names[i].lower() for i in name_order])
+
+        return cls(
+            person_ids, names, [row[2] for row in people],
+            movie_ids, [row[1] for row in movies], [row[2] for row in movies],
+            person_offsets, person_movies, movie_offsets, movie_stars,
+            name_order, components, component_sizes,
+            postings.grams, postings.offsets, postings.positions,
+            postings.counts
+        )
+
+    @classmethod
+    def from_directory(cls, directory, cache=True):
+        """
+        Returns the compact graph for a data directory, reusing the binary
+        snapshot next to the CSV files when it is still up to date.
+
+        When the snapshot is missing or stale, the graph is built from the
+        CSV files and a new snapshot is written (if cache is True).
+        """
+        path = os.path.join(directory, SNAPSHOT_NAME)
+        stamp = csv_stamp(directory)
+        if cache:
+            try:
+                return cls.load(path, stamp)
+            except (OSError, ValueError):
+                pass
+
+        graph = cls.from_csv(directory)
+        if cache:
+            try:
+                graph.save(path, stamp)
+            except OSError:
+                # read only data directory, just skip caching
+                pass
+        return graph
+
+    def save(self, path, stamp=None):
+        """
+        Writes the graph to a binary snapshot file at path.
+
+        The file is a JSON header describing each section followed by the
+        raw native-endian arrays, each aligned to 8 bytes so they can be
+        memory mapped directly by load.
+        """
+        sections = []
+        for name in INT_SECTIONS:
+            sections.append((name, "i", bytes(getattr(self, name))))
+        for name in STRING_SECTIONS:
+            offsets, blob = _encode_strings(getattr(self, name))
+            sections.append((name + ".offsets", "q", offsets.tobytes()))
+            sections.append((name + ".blob", "B", blob))
+
+        layout = {}
+        position = 0
+        for name, typecode, data in sections:
+            layout[name] = [position, len(data), typecode]
+            position += _padded(len(data))
+        header = json.dumps({"stamp": stamp, "sections": layout}).encode()
+        start = _padded(len(SNAPSHOT_MAGIC) + 8 + len(header))
+
+        # write to a temporary file first so readers never see half a snapshot
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(SNAPSHOT_MAGIC)
+                f.write(len(header).to_bytes(8, "little"))
+                f.write(header)
+                f.write(bytes(start - f.tell()))
+                for name, typecode, data in sections:
+                    f.write(data)
+                    f.write(bytes(_padded(len(data)) - len(data)))
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    @classmethod
+    def load(cls, path, stamp=None):
+        """
+        Memory maps a snapshot written by save.
+
+        Raises ValueError if the file is not a snapshot, is truncated or
+        malformed, or if stamp is given and does not match the stamp the
+        snapshot was saved with.
+        """
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(buffer)
+        magic_end = len(SNAPSHOT_MAGIC)
+        if bytes(view[:magic_end]) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a degrees snapshot")
+        size = int.from_bytes(view[magic_end:magic_end + 8], "little")
+        if magic_end + 8 + size > len(buffer):
+            raise ValueError(f"{path} is truncated")
+        try:
+            header = json.loads(bytes(view[magic_end + 8:magic_end + 8 + size]))
+            layout = header["sections"]
+            saved_stamp = header["stamp"]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{path} has a malformed header")
+        if stamp is not None and saved_stamp != stamp:
+            raise ValueError(f"{path} is out of date")
+        start = _padded(magic_end + 8 + size)
+
+        def section(name, typecode):
+            try:
+                offset, length, saved_typecode = layout[name]
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"{path} has a malformed header")
+            if saved_typecode != typecode \
+                    or not isinstance(offset, int) or offset < 0 \
+                    or not isinstance(length, int) or length < 0 \
+                    or length % array(typecode).itemsize:
+                raise ValueError(f"{path} has a malformed header")
+            if start + offset + length > len(buffer):
+                raise ValueError(f"{path} is truncated")
+            return view[start + offset:start + offset + length].cast(typecode)
+
+        fields = {name: section(name, "i") for name in INT_SECTIONS}
+        for name in STRING_SECTIONS:
+            offsets = section(name + ".offsets", "q")
+            blob = section(name + ".blob", "B")
+            if len(offsets) < 1 or offsets[-1] > len(blob):
+                raise ValueError(f"{path} has a malformed {name} section")
+            fields[name] = StringTable(offsets, blob)
+
+        # the sections must agree on the number of people and movies
+        people = len(fields["person_ids"])
+        movies = len(fields["movie_ids"])
+        if (len(fields["person_offsets"]) != people + 1
+                or len(fields["movie_offsets"]) != movies + 1
+                or len(fields["name_order"]) != people
+                or len(fields["components"]) != people
+                or len(fields["gram_offsets"]) != len(fields["grams"]) + 1
+                or fields["gram_offsets"][-1] != len(fields["gram_positions"])
+                or len(fields["gram_counts"]) != people):
+            raise ValueError(f"{path} has inconsistent sections")
+        graph = cls(**fields)
+
+        # keep the mapping alive for as long as the graph uses it
+        graph.buffer = buffer
+        return graph
+
+    def person_index(self, person_id):
+        """
+        Returns the index of a person's IMDB id, or None if it is unknown.
+        """
+        return _find(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the index of a movie's IMDB id, or None if it is unknown.
+        """
+        return _find(self.movie_ids, movie_id)
+
+    def connected(self, source, target):
+        """
+        Returns True if the two person indices are in the same component.
+        """
+        return self.components[source] == self.components[target]
+
+    def connected_ids(self, source_id, target_id):
+        """
+        Same as connected, but takes IMDB ids.
+        """
+        return self.connected(self.person_index(source_id),
+                              self.person_index(target_id))
+
+    def component_size_id(self, person_id):
+        """
+        Returns the number of people in a person's connected component.
+        """
+        return self.component_sizes[self.components[self.person_index(person_id)]]
+
+    def movies_for(self, person):
+        """
+        Returns the movie indices a person index starred in.
+        """
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_for(self, movie):
+        """
+        Returns the person indices starring in a movie index.
+        """
+        offsets = self.movie_offsets
+        return self.movie_stars[offsets[movie]:offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people
+        who starred with a given person index.
+        """
+        person_movies = self.person_movies
+        movie_stars = self.movie_stars
+        movie_offsets = self.movie_offsets
+        for i in range(self.person_offsets[person],
+                       self.person_offsets[person + 1]):
+            movie = person_movies[i]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                yield movie, movie_stars[j]
+
+    def indices_for_name(self, name):
+        """
+        Returns the person indices whose lower cased name equals name.
+        """
+        keys = NameKeys(self)
+        low = bisect_left(keys, name)
+        high = bisect_right(keys, name, lo=low)
+        return self.name_order[low:high]
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie, person) index pairs
+        that connect the source index to the target index, using a
+        breadth first search that grows from both ends.
+
+        If no possible path, returns None.
+        """
+        self.explored = 0
+        if source == target or not self.connected(source, target):
+            return None
+
+        forward_parents = {source: None}
+        backward_parents = {target: None}
+        forward_frontier = [source]
+        backward_frontier = [target]
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = self._expand_level(
+                    forward_frontier, forward_parents, backward_parents)
+            else:
+                backward_frontier, meeting = self._expand_level(
+                    backward_frontier, backward_parents, forward_parents)
+
+            if meeting is not None:
+                return _splice_path(meeting, forward_parents, backward_parents)
+
+        return None
+
+    def _expand_level(self, frontier, parents, other_parents):
+        """
+        Expands every person index in frontier by one step, with the
+        neighbor loops inlined so no tuples are built per edge.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        next_frontier = []
+        for person in frontier:
+            self.explored += 1
+            for i in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[i]
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_stars[j]
+                    if neighbor in parents:
+                        continue
+                    parents[neighbor] = (movie, person)
+                    if neighbor in other_parents:
+                        return next_frontier, neighbor
+                    next_frontier.append(neighbor)
+        return next_frontier, None
+
+    def shortest_path_ids(self, source_id, target_id):
+        """
+        Same as shortest_path, but takes and returns IMDB ids.
+        """
+        self.explored = 0
+        source = self.person_index(source_id)
+        target = self.person_index(target_id)
+        if source is None or target is None:
+            return None
+        path = self.shortest_path(source, target)
+        if path is None:
+            return None
+        return self.path_ids(path)
+
+    def shortest_path_tree_ids(self, source_id, target_ids):
+        """
+        Returns a dict mapping each IMDB id in target_ids to the shortest
+        list of (movie_id, person_id) pairs from source_id, or to None if
+        there is no such path. One breadth first search answers every target.
+        """
+        source = self.person_index(source_id)
+        targets = {target_id: self.person_index(target_id)
+                   for target_id in target_ids}
+        remaining = {target for target in targets.values()
+                     if target is not None and target != source
+                     and source is not None and self.connected(source, target)}
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        self.explored = 0
+        parents = {source: None}
+        frontier = [source] if source is not None else []
+        while frontier and remaining:
+            next_frontier = []
+            for person in frontier:
+                self.explored += 1
+                for i in range(person_offsets[person],
+                               person_offsets[person + 1]):
+                    movie = person_movies[i]
+                    for j in range(movie_offsets[movie],
+                                   movie_offsets[movie + 1]):
+                        neighbor = movie_stars[j]
+                        if neighbor not in parents:
+                            parents[neighbor] = (movie, person)
+                            remaining.discard(neighbor)
+                            next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        paths = {}
+        for target_id, target in targets.items():
+            if target is None or target == source or target not in parents:
+                paths[target_id] = None
+                continue
+            path = []
+            person = target
+            while parents[person] is not None:
+                movie, parent = parents[person]
+                path.append((movie, person))
+                person = parent
+            path.reverse()
+            paths[target_id] = self.path_ids(path)
+        return paths
+
+    def path_ids(self, path):
+        """
+        Translates a list of (movie, person) index pairs
+        back to (movie_id, person_id) pairs.
+        """
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        return {(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in self.neighbors(self.person_index(person_id))}
+
+
+def build_csr(pairs, num_people, num_movies):
+    """
+    Builds the person -> movies and movie -> stars adjacency arrays
+    from sorted, de-duplicated person * num_movies + movie codes.
+    """
+    person_offsets = array("i", bytes(4 * (num_people + 1)))
+    movie_offsets = array("i", bytes(4 * (num_movies + 1)))
+    person_movies = array("i", bytes(4 * len(pairs)))
+    movie_stars = array("i", bytes(4 * len(pairs)))
+
+    # pairs are sorted by person, so person_movies can be filled in order
+    for i, code in enumerate(pairs):
+        person, movie = divmod(code, num_movies)
+        person_offsets[person + 1] += 1
+        movie_offsets[movie + 1] += 1
+        person_movies[i] = movie
+    for i in range(num_people):
+        person_offsets[i + 1] += person_offsets[i]
+    for i in range(num_movies):
+        movie_offsets[i + 1] += movie_offsets[i]
+
+    # scatter each person into the next free slot of their movie
+    cursor = array("i", movie_offsets[:-1])
+    for code in pairs:
+        person, movie = divmod(code, num_movies)
+        movie_stars[cursor[movie]] = person
+        cursor[movie] += 1
+
+    return person_offsets, person_movies, movie_offsets, movie_stars
+
+
+def label_components(num_people, movie_offsets, movie_stars):
+    """
+    Returns (components, component_sizes) arrays from union-find over the
+    stars of each movie. Each component is labelled by one of its members.
+    """
+    parents = array("i", range(num_people))
+    sizes = array("i", [1]) * num_people
+
+    def find(person):
+        while parents[person] != person:
+            parents[person] = parents[parents[person]]
+            person = parents[person]
+        return person
+
+    for movie in range(len(movie_offsets) - 1):
+        start, end = movie_offsets[movie], movie_offsets[movie + 1]
+        if start == end:
+            continue
+        root = find(movie_stars[start])
+        for i in range(start + 1, end):
+            other = find(movie_stars[i])
+            if other == root:
+                continue
+            if sizes[root] < sizes[other]:
+                root, other = other, root
+            parents[other] = root
+            sizes[root] += sizes[other]
+
+    components = array("i", (find(person) for person in range(num_people)))
+    component_sizes = array("i", bytes(4 * num_people))
+    for label in components:
+        component_sizes[label] += 1
+    return components, component_sizes
+
+
+def csv_stamp(directory):
+    """
+    Returns the sizes and modification times of the CSV files in directory,
+    used to tell whether a snapshot is still up to date.
+    """
+    stamp = []
+    for name in ("people.csv", "movies.csv", "stars.csv"):
+        stat = os.stat(os.path.join(directory, name))
+        stamp.append([name, stat.st_size, stat.st_mtime_ns])
+    return stamp
+
+
+class StringTable(Sequence):
+    """
+    Sequence of strings stored as one utf-8 blob plus an array of
+    offsets, strings are decoded on access.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def _encode_strings(strings):
+    """
+    Returns the offsets array and utf-8 blob for a StringTable.
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = array("q", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    return offsets, b"".join(encoded)
+
+
+def _padded(length):
+    """
+    Rounds length up to a multiple of 8 bytes.
+    """
+    return (length + 7) // 8 * 8
+
+
+def _find(sorted_ids, key):
+    """
+    Returns the position of key in sorted_ids, or None if it is missing.
+    """
+    i = bisect_left(sorted_ids, key)
+    if i < len(sorted_ids) and sorted_ids[i] == key:
+        return i
+    return None
+
+
+def _splice_path(meeting, forward_parents, backward_parents):
+    """
+    Joins the two halves of a bidirectional search at the meeting index.
+    """
+    path = []
+    person = meeting
+    while forward_parents[person] is not None:
+        movie, parent = forward_parents[person]
+        path.append((movie, person))
+        person = parent
+    path.reverse()
+
+    person = meeting
+    while backward_parents[person] is not None:
+        movie, following = backward_parents[person]
+        path.append((movie, following))
+        person = following
+    return path
+
+
+class NameKeys(Sequence):
+    """
+    Lower cased names of a CompactGraph's people in name order, so the name
+    order can be binary searched by name.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("name index out of range")
+        return self.graph.person_names[self.graph.name_order[i]].lower()
+
+    def __len__(self):
+        return len(self.graph.name_order)
+
+
+class PeopleView(Mapping):
+    """
+    Read only view of a CompactGraph shaped like the degrees.people dict,
+    records are built on access.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        person = self.graph.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return {
+            "name": self.graph.person_names[person],
+            "birth": self.graph.person_births[person],
+            "movies": {self.graph.movie_ids[movie]
+                       for movie in self.graph.movies_for(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read only view of a CompactGraph shaped like the degrees.movies dict,
+    records are built on access.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        movie = self.graph.movie_index(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return {
+            "title": self.graph.movie_titles[movie],
+            "year": self.graph.movie_years[movie],
+            "stars": {self.graph.person_ids[person]
+                      for person in self.graph.stars_for(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Read only view of a CompactGraph shaped like the degrees.names dict,
+    mapping lower cased names to sets of person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        indices = self.graph.indices_for_name(name)
+        if not indices:
+            raise KeyError(name)
+        return {self.graph.person_ids[person] for person in indices}
+
+    def __iter__(self):
+        previous = None
+        for person in self.graph.name_order:
+            name = self.graph.person_names[person].lower()
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,263 @@
+import heapq
+import itertools
+import json
+from array import array
+
+# First bytes of every landmark index file, bump the version when the
+# layout changes
+LANDMARK_MAGIC = b"DEGLMRK3"
+
+# Distances are kept in single bytes: UNREACHABLE is stored for people a
+# landmark cannot reach, and FAR for people it reaches in FAR or more hops
+UNREACHABLE = 255
+FAR = 254
+
+
+class OutOfDate(ValueError):
+    """
+    Raised when loading a landmark index built from different data.
+    """
+
+
+class LandmarkIndex():
+    """
+    Breadth first search distances from a few well connected landmark people
+    to everyone else, one byte per (landmark, person).
+
+    By the triangle inequality, for any landmark L the separation between
+    a source and a target lies between |d(source, L) - d(target, L)| and
+    d(source, L) + d(target, L), which gives instant bounds and an
+    admissible heuristic for A* search.
+
+    People are numbered in order of their sorted IMDB ids, the same order
+    a CompactGraph uses, so with a graph loaded a person's column is just
+    their graph index and no ids are stored at all.
+    """
+
+    def __init__(self, position, landmarks, distances, stamp=None):
+        # position(person_id) is the column of a person in distances
+        self.position = position
+        self.landmarks = landmarks
+
+        # distances[k][position(p)] is the distance from landmarks[k] to p
+        self.distances = distances
+
+        # csv_stamp of the data the index was built from
+        self.stamp = stamp
+
+    @classmethod
+    def build(cls, people, neighbors_for_person, count=32, graph=None,
+              stamp=None):
+        """
+        Builds an index from a degrees.people style mapping and a
+        neighbors_for_person function, using up to count landmarks.
+        graph is the CompactGraph people is a view of, if any.
+
+        Landmarks are picked by number of movies, skipping anyone who
+        already co-starred with a chosen landmark so they are spread out.
+        """
+        position = person_positions(people, graph)
+        by_degree = sorted(people,
+                           key=lambda person_id: -len(people[person_id]["movies"]))
+
+        landmarks = []
+        distances = []
+        for candidate in by_degree:
+            if len(landmarks) == count:
+                break
+            column = position(candidate)
+            if any(row[column] <= 1 for row in distances):
+                continue
+            landmarks.append(candidate)
+            distances.append(_distances_from(
+                candidate, position, len(people), neighbors_for_person))
+        return cls(position, landmarks, distances, stamp)
+
+    def save(self, path):
+        """
+        Writes the index to a binary file at path.
+        """
+        header = json.dumps({
+            "people": len(self.distances[0]) if self.distances else 0,
+            "landmarks": self.landmarks,
+            "stamp": self.stamp
+        }).encode()
+        with open(path, "wb") as f:
+            f.write(LANDMARK_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for row in self.distances:
+                f.write(row.tobytes())
+
+    @classmethod
+    def load(cls, path, people, graph=None, stamp=None):
+        """
+        Reads an index written by save, for the loaded people (and the
+        CompactGraph they are a view of, if any).
+
+        Raises ValueError if the file is not a landmark index, and
+        OutOfDate if it was built for other people or by another version,
+        or if stamp is given and does not match the stamp it was built with.
+        """
+        with open(path, "rb") as f:
+            magic = f.read(len(LANDMARK_MAGIC))
+            if magic != LANDMARK_MAGIC:
+                if magic[:-1] == LANDMARK_MAGIC[:-1]:
+                    raise OutOfDate(f"{path} was built by another version")
+                raise ValueError(f"{path} is not a landmark index")
+            try:
+                header = json.loads(
+                    f.read(int.from_bytes(f.read(8), "little")))
+                count = header["people"]
+                landmarks = header["landmarks"]
+                saved_stamp = header["stamp"]
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"{path} has a malformed header")
+            if stamp is not None and saved_stamp != stamp:
+                raise OutOfDate(f"{path} is out of date")
+            if landmarks and count != len(people):
+                raise OutOfDate(f"{path} was built for other data")
+            distances = []
+            for _ in landmarks:
+                row = array("B")
+                row.frombytes(f.read(count))
+                if len(row) != count:
+                    raise ValueError(f"{path} is truncated")
+                distances.append(row)
+        return cls(person_positions(people, graph), landmarks, distances,
+                   saved_stamp)
+
+    def bounds(self, source, target, connected=None):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        two person_ids. upper is None when no landmark is within FAR hops
+        of both people.
+
+        Returns None if the two are not connected, as told by
+        connected(source, target) if it is given (e.g. degrees.connected),
+        else by some landmark reaching exactly one of them.
+        """
+        if source == target:
+            return (0, 0)
+        source_position = self.position(source)
+        target_position = self.position(target)
+        if connected is not None and not connected(source, target):
+            return None
+        lower = 1
+        upper = None
+        for row in self.distances:
+            to_source = row[source_position]
+            to_target = row[target_position]
+            if connected is None \
+                    and (to_source == UNREACHABLE) != (to_target == UNREACHABLE):
+                return None
+            # only exact distances give bounds
+            if to_source >= FAR or to_target >= FAR:
+                continue
+            lower = max(lower, abs(to_source - to_target))
+            if upper is None or to_source + to_target < upper:
+                upper = to_source + to_target
+        return (lower, upper)
+
+    def heuristic(self, person_id, target_row):
+        """
+        Returns the largest landmark lower bound on the distance from a
+        person to the target, where target_row holds the target's
+        distance to each landmark.
+        """
+        position = self.position(person_id)
+        estimate = 0
+        for row, to_target in zip(self.distances, target_row):
+            to_person = row[position]
+            if to_person < FAR and to_target < FAR:
+                estimate = max(estimate, abs(to_person - to_target))
+        return estimate
+
+    def shortest_path(self, source, target, neighbors_for_person,
+                      connected=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, using A* search guided by
+        the landmark lower bounds. connected is passed on to bounds.
+
+        If no possible path, returns None.
+        """
+        if source == target \
+                or self.bounds(source, target, connected) is None:
+            return None
+
+        target_position = self.position(target)
+        target_row = [row[target_position] for row in self.distances]
+
+        # the counter breaks ties between equal priorities
+        counter = itertools.count()
+        parents = {source: None}
+        cost = {source: 0}
+        frontier = [(self.heuristic(source, target_row), next(counter), source)]
+        explored = set()
+
+        while frontier:
+            _, _, person_id = heapq.heappop(frontier)
+            if person_id == target:
+                path = []
+                while parents[person_id] is not None:
+                    movie_id, parent_id = parents[person_id]
+                    path.append((movie_id, person_id))
+                    person_id = parent_id
+                path.reverse()
+                return path
+            if person_id in explored:
+                continue
+            explored.add(person_id)
+
+            for movie_id, neighbor_id in neighbors_for_person(person_id):
+                neighbor_cost = cost[person_id] + 1
+                if neighbor_cost < cost.get(neighbor_id, neighbor_cost + 1):
+                    cost[neighbor_id] = neighbor_cost
+                    parents[neighbor_id] = (movie_id, person_id)
+                    priority = neighbor_cost + self.heuristic(
+                        neighbor_id, target_row)
+                    heapq.heappush(
+                        frontier, (priority, next(counter), neighbor_id))
+
+        return None
+
+
+def person_positions(people, graph=None):
+    """
+    Returns a function mapping person_ids to their column in a landmark
+    index: the person's index in graph if there is one, else their rank
+    among the sorted ids of people. Raises KeyError for unknown people.
+    """
+    if graph is not None:
+        def position(person_id):
+            index = graph.person_index(person_id)
+            if index is None:
+                raise KeyError(person_id)
+            return index
+        return position
+    return {person_id: i for i, person_id in enumerate(sorted(people))}.__getitem__
+
+
+def _distances_from(landmark, position, count, neighbors_for_person):
+    """
+    Returns a byte array of breadth first search distances from landmark
+    to each of count people, indexed by position(person_id). The search
+    covers the landmark's whole component, storing FAR for anyone FAR or
+    more hops away, so UNREACHABLE really means not connected.
+    """
+    distances = array("B", [UNREACHABLE]) * count
+    distances[position(landmark)] = 0
+    frontier = [landmark]
+    depth = 0
+    while frontier:
+        depth = min(depth + 1, FAR)
+        next_frontier = []
+        for person_id in frontier:
+            for _, neighbor_id in neighbors_for_person(person_id):
+                column = position(neighbor_id)
+                if distances[column] == UNREACHABLE:
+                    distances[column] = depth
+                    next_frontier.append(neighbor_id)
+        frontier = next_frontier
+    return distances
@@ -0,0 +1,164 @@
+import math
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+
+from graph import NameKeys
+from trigrams import Postings, trigrams
+
+
+class NameIndex():
+    """
+    Lookup index over lower cased names.
+
+    Names are kept in one sorted sequence (with a parallel sequence of
+    person_ids), so exact and prefix lookups are binary searches. Fuzzy
+    lookups use trigram postings over the distinct names, built along with
+    the index unless they are given (a CompactGraph stores them in its
+    snapshot).
+    """
+
+    def __init__(self, keys, person_ids, postings=None):
+        # keys is sorted, and person_ids[i] is the person named keys[i]
+        self.keys = keys
+        self.person_ids = person_ids
+        if postings is None:
+            postings = Postings.build(keys)
+        self.postings = postings
+
+    @classmethod
+    def build(cls, people):
+        """
+        Builds an index from a degrees.people style mapping.
+        """
+        entries = sorted(
+            (person["name"].lower(), person_id)
+            for person_id, person in people.items()
+        )
+        return cls([entry[0] for entry in entries],
+                   [entry[1] for entry in entries])
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Builds an index over a CompactGraph's name order without copying
+        the names out of the graph.
+        """
+        postings = Postings(graph.grams, graph.gram_offsets,
+                            graph.gram_positions, graph.gram_counts)
+        return cls(NameKeys(graph), _GraphNameIds(graph), postings)
+
+    def exact(self, name):
+        """
+        Returns the person_ids whose name equals name, ignoring case.
+        """
+        name = name.lower()
+        low = bisect_left(self.keys, name)
+        high = bisect_right(self.keys, name, lo=low)
+        return [self.person_ids[i] for i in range(low, high)]
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to limit (name, person_ids) pairs whose name starts
+        with prefix, ignoring case, in alphabetical order.
+        """
+        prefix = prefix.lower()
+        i = bisect_left(self.keys, prefix)
+        matches = []
+        while i < len(self.keys) and len(matches) < limit:
+            name = self.keys[i]
+            if not name.startswith(prefix):
+                break
+            end = bisect_right(self.keys, name, lo=i)
+            matches.append((name, [self.person_ids[j] for j in range(i, end)]))
+            i = end
+        return matches
+
+    def fuzzy(self, query, limit=10, threshold=0.5):
+        """
+        Returns up to limit (score, name, person_ids) triples for names
+        similar to query, best first. The score is the Dice coefficient of
+        the two names' trigram sets, and names scoring below threshold are
+        left out.
+        """
+        query_grams = trigrams(query.lower())
+        if not query_grams:
+            return []
+
+        # a name scoring at least threshold must share at least `needed`
+        # trigrams with the query, so by pigeonhole it appears in one of the
+        # len - needed + 1 rarest postings, and only those are candidates
+        needed = max(1, math.ceil(threshold * len(query_grams) / 2))
+        postings = sorted(
+            (self.postings.get(gram) for gram in query_grams), key=len)
+        rare = len(postings) - needed + 1
+        shared = {}
+        for posting in postings[:rare]:
+            for position in posting:
+                shared[position] = shared.get(position, 0) + 1
+
+        # the common postings only add to the counts of those candidates
+        for posting in postings[rare:]:
+            if len(posting) <= len(shared):
+                for position in posting:
+                    if position in shared:
+                        shared[position] += 1
+            else:
+                for position in shared:
+                    i = bisect_left(posting, position)
+                    if i < len(posting) and posting[i] == position:
+                        shared[position] += 1
+
+        counts = self.postings.counts
+        scored = []
+        for position, count in shared.items():
+            score = 2 * count / (len(query_grams) + counts[position])
+            if score >= threshold:
+                scored.append((score, self.keys[position], position))
+        scored.sort(key=lambda match: (-match[0], match[1]))
+
+        matches = []
+        for score, name, position in scored[:limit]:
+            end = bisect_right(self.keys, name, lo=position)
+            matches.append(
+                (score, name, [self.person_ids[j] for j in range(position, end)]))
+        return matches
+
+    def search(self, name, limit=10):
+        """
+        Returns up to limit (name, person_ids) candidates for name:
+        the exact match if there is one, then prefix matches, then fuzzy
+        matches.
+        """
+        matches = []
+        seen = set()
+        exact = self.exact(name)
+        if exact:
+            matches.append((name.lower(), exact))
+            seen.add(name.lower())
+        for match_name, person_ids in self.prefix(name, limit):
+            if match_name not in seen:
+                matches.append((match_name, person_ids))
+                seen.add(match_name)
+        if len(matches) < limit:
+            for _, match_name, person_ids in self.fuzzy(name, limit):
+                if match_name not in seen:
+                    matches.append((match_name, person_ids))
+                    seen.add(match_name)
+        return matches[:limit]
+
+
+class _GraphNameIds(Sequence):
+    """
+    IMDB ids of a CompactGraph's people, in name order.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("name index out of range")
+        return self.graph.person_ids[self.graph.name_order[i]]
+
+    def __len__(self):
+        return len(self.graph.name_order)
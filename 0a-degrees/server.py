@@ -0,0 +1,274 @@
+"""
+Resident degrees query server.
+
+The server loads the data once and then answers requests over a local TCP
+or Unix socket. The protocol is line delimited JSON: each request is one
+JSON object on its own line, and each response is one JSON object carrying
+the same "id" as its request. Responses may arrive out of order.
+
+Requests:
+    {"id": 1, "op": "person_id_for_name", "name": "Kevin Bacon"}
+    {"id": 2, "op": "shortest_path", "source": "102", "target": "158"}
+    {"id": 3, "op": "person_id_for_name", "name": "kevn bacon",
+     "policy": "most-connected", "fuzzy": true}
+    {"id": 4, "op": "search_names", "name": "kevin b", "limit": 5}
+
+Responses:
+    {"id": 1, "result": ["102"]}
+    {"id": 2, "result": [["112384", "158"]]}
+    {"id": 3, "result": "102"}
+    {"id": 4, "result": [["kevin bacon", ["102"]]]}
+    {"id": 5, "error": "unknown op 'foo'"}
+
+usage ex. `python 0a-degrees/server.py serve 0a-degrees/large --compact`
+          `python 0a-degrees/server.py query shortest_path 102 158`
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import degrees
+
+DEFAULT_ADDRESS = "127.0.0.1:8650"
+
+
+def parse_address(address):
+    """
+    Returns ("unix", path) for "unix:/some/path" addresses,
+    else ("tcp", (host, port)) for "host:port" addresses.
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+class DegreesServer():
+    """
+    Answers requests against the data already loaded into the degrees
+    module, running searches in a pool of worker processes so a slow
+    search does not hold up other clients.
+    """
+
+    def __init__(self, workers=2, initargs=()):
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        self.executor = ProcessPoolExecutor(
+            workers, mp_context=context,
+            initializer=degrees._init_worker, initargs=initargs)
+        self.workers = workers
+
+    async def start(self, address):
+        """
+        Starts the worker processes and begins listening on address.
+        """
+        # start every worker up front, while nothing else is running
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _ping)
+            for _ in range(self.workers)
+        ])
+
+        kind, where = parse_address(address)
+        if kind == "unix":
+            return await asyncio.start_unix_server(self.handle, path=where)
+        return await asyncio.start_server(self.handle, *where)
+
+    async def handle(self, reader, writer):
+        """
+        Serves one client connection, answering each request line in its
+        own task so responses are written as soon as they are ready.
+        """
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(line):
+            response = await self.respond(line)
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, line):
+        """
+        Returns the response dict for one raw request line.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"id": None, "error": "invalid JSON"}
+        if not isinstance(request, dict):
+            return {"id": None, "error": "request must be a JSON object"}
+
+        response = {"id": request.get("id")}
+        try:
+            response["result"] = await self.dispatch(request)
+        except (KeyError, TypeError) as e:
+            response["error"] = f"bad request: {e}"
+        except ValueError as e:
+            response["error"] = str(e)
+        except Exception as e:
+            # never let one request take down the rest of the connection
+            response["error"] = f"internal error: {e!r}"
+        return response
+
+    async def dispatch(self, request):
+        op = request.get("op")
+        # name lookups can fall back to a fuzzy search, so like path
+        # searches they run in the workers rather than on the event loop
+        loop = asyncio.get_running_loop()
+        if op == "person_id_for_name":
+            name = _field(request, "name", str)
+            fuzzy = bool(request.get("fuzzy", False))
+            if "policy" not in request:
+                return await loop.run_in_executor(
+                    self.executor, _candidates_for_name, name, fuzzy)
+            policy = _field(request, "policy", str)
+            if policy == "ask":
+                raise ValueError("the server cannot ask which person is intended")
+            return await loop.run_in_executor(
+                self.executor, degrees.person_id_for_name, name, policy, fuzzy)
+        if op == "search_names":
+            return await loop.run_in_executor(
+                self.executor, _search_names, _field(request, "name", str),
+                _field(request, "limit", int, 10))
+        if op == "shortest_path":
+            source = _field(request, "source", str)
+            target = _field(request, "target", str)
+            for person_id in (source, target):
+                if person_id not in degrees.people:
+                    raise ValueError(f"unknown person_id {person_id!r}")
+            return await loop.run_in_executor(
+                self.executor, degrees.shortest_path, source, target)
+        raise ValueError(f"unknown op {op!r}")
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def _field(request, name, kind, default=None):
+    """
+    Returns request[name], or default if it is missing and not None,
+    raising ValueError unless the value is of type kind.
+    """
+    if name not in request and default is not None:
+        return default
+    if name not in request:
+        raise ValueError(f"missing field {name!r}")
+    value = request[name]
+    # JSON true and false are ints to Python
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ValueError(f"field {name!r} must be {_KINDS[kind]}")
+    return value
+
+
+_KINDS = {str: "a string", int: "an integer"}
+
+
+def _ping():
+    return True
+
+
+def _candidates_for_name(name, fuzzy):
+    return sorted(degrees.candidates_for_name(name, fuzzy))
+
+
+def _search_names(name, limit):
+    return degrees.name_index.search(name, limit)
+
+
+def query(address, request):
+    """
+    Sends one request to a running server and returns the response dict.
+    """
+    kind, where = parse_address(address)
+    family = socket.AF_UNIX if kind == "unix" else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as connection:
+        connection.connect(where)
+        connection.sendall(json.dumps(request).encode() + b"\n")
+        connection.shutdown(socket.SHUT_WR)
+        with connection.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+async def serve(address, workers, initargs):
+    server = DegreesServer(workers=workers, initargs=initargs)
+    try:
+        listener = await server.start(address)
+        print(f"Listening on {address}.", file=sys.stderr)
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident degrees server.")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS,
+                        help="host:port or unix:/path/to/socket")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="load data and serve")
+    serve_parser.add_argument("directory", nargs="?", default="0a-degrees/large")
+    serve_parser.add_argument("--compact", action="store_true",
+                              help="load the data into a compact integer graph")
+    serve_parser.add_argument("--no-cache", action="store_true",
+                              help="do not read or write the graph snapshot")
+    serve_parser.add_argument("--workers", type=int, default=2,
+                              help="number of search processes")
+
+    query_parser = commands.add_parser("query", help="send one request")
+    query_parser.add_argument("op", choices=["person_id_for_name",
+                                             "search_names", "shortest_path"])
+    query_parser.add_argument("args", nargs="+",
+                              help="a name, or a source and target person_id")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        print("Loading data...", file=sys.stderr)
+        degrees.load_data(args.directory, compact=args.compact,
+                          cache=not args.no_cache)
+        print("Data loaded.", file=sys.stderr)
+        initargs = (args.directory, args.compact, not args.no_cache)
+        try:
+            asyncio.run(serve(args.address, args.workers, initargs))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.op in ("person_id_for_name", "search_names"):
+        request = {"id": 1, "op": args.op, "name": " ".join(args.args)}
+    elif len(args.args) == 2:
+        request = {"id": 1, "op": args.op,
+                   "source": args.args[0], "target": args.args[1]}
+    else:
+        parser.error("shortest_path takes a source and a target person_id")
+    response = query(args.address, request)
+    print(json.dumps(response))
+    if "error" in response:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from array import array
+from bisect import bisect_left
+
+
+def trigrams(name):
+    """
+    Returns the set of three letter substrings of a name, padded with
+    spaces so that the start and end of words count too.
+    """
+    padded = f"  {' '.join(name.split())} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Postings():
+    """
+    Trigram postings over a sorted sequence of names.
+
+    grams is the sorted list of trigrams, and the distinct names containing
+    grams[g] are positions[offsets[g]:offsets[g + 1]], each given by the
+    position of its first copy, in increasing order. counts[p] is the
+    number of distinct trigrams of the name at position p.
+    """
+
+    def __init__(self, grams, offsets, positions, counts):
+        self.grams = grams
+        self.offsets = offsets
+        self.positions = positions
+        self.counts = counts
+
+    @classmethod
+    def build(cls, keys):
+        """
+        Builds the postings of a sorted sequence of lower cased names.
+        """
+        postings = {}
+        counts = array("i", bytes(4 * len(keys)))
+        previous = None
+        for position, name in enumerate(keys):
+            if name == previous:
+                continue
+            previous = name
+            grams = trigrams(name)
+            counts[position] = len(grams)
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("i")
+                posting.append(position)
+
+        grams = sorted(postings)
+        offsets = array("i", [0])
+        positions = array("i")
+        for gram in grams:
+            positions.extend(postings[gram])
+            offsets.append(len(positions))
+        return cls(grams, offsets, positions, counts)
+
+    def get(self, gram):
+        """
+        Returns the positions of the names containing gram, in increasing
+        order.
+        """
+        i = bisect_left(self.grams, gram)
+        if i == len(self.grams) or self.grams[i] != gram:
+            return self.positions[:0]
+        return self.positions[self.offsets[i]:self.offsets[i + 1]]
@@ -0,0 +1,125 @@
+"""
+Batch evaluation of Tic Tac Toe boards with NumPy
+
+Boards are rows of an (N, 9) integer array, where column 3 * i + j holds
+cell (i, j): 1 for X, -1 for O and 0 for empty. winners, terminals and
+utilities score every row at once and agree with the per-board winner,
+terminal and utility functions of tictactoe.
+
+usage ex. `python 0b-tictactoe/batch.py --boards 1000000`
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import bitboard
+
+X = 1
+O = -1
+EMPTY = 0
+
+# the 8 winning lines as masks, in the order tictactoe.winner checks them,
+# and the place value of each column
+LINES = np.array(bitboard.LINES, dtype=np.int16)
+BITS = 1 << np.arange(9, dtype=np.int16)
+
+# codes of the cell values of a list of lists board
+CODES = {bitboard.X: X, bitboard.O: O, bitboard.EMPTY: EMPTY}
+
+
+def to_array(boards):
+    """
+    Converts a list of tictactoe list of lists boards into an (N, 9) array.
+    """
+    return np.array([[CODES[value] for row in board for value in row]
+                     for board in boards], dtype=np.int8).reshape(-1, 9)
+
+
+def to_masks(boards):
+    """
+    Returns the (x, o) bit masks of every row of boards, as two arrays.
+    """
+    boards = np.asarray(boards)
+    x = ((boards == X) * BITS).sum(axis=1)
+    o = ((boards == O) * BITS).sum(axis=1)
+    return x, o
+
+
+def completed(masks):
+    """
+    Returns an (N, 8) boolean array, True where the mask completes a line.
+    """
+    return (masks[:, None] & LINES) == LINES
+
+
+def first_winner(x_lines, o_lines):
+    """
+    Returns the winner of every board given the lines each player completed.
+    Boards where both players have a line cannot come up in a real game,
+    for those the owner of the first line wins, just like in tictactoe.winner.
+    """
+    either = x_lines | o_lines
+    first = either.argmax(axis=1)
+    rows = np.arange(len(first))
+    return np.where(~either.any(axis=1), EMPTY,
+                    np.where(x_lines[rows, first], X, O)).astype(np.int8)
+
+
+def winners(boards):
+    """
+    Returns an array with the winner of every board, X, O or EMPTY if
+    there is none.
+    """
+    x, o = to_masks(boards)
+    return first_winner(completed(x), completed(o))
+
+
+def terminals(boards):
+    """
+    Returns a boolean array, True where the game is over.
+    """
+    x, o = to_masks(boards)
+    return (completed(x).any(axis=1) | completed(o).any(axis=1)
+            | ((x | o) == bitboard.FULL))
+
+
+def utilities(boards):
+    """
+    Returns an array of 1 where X has won, -1 where O has won, 0 otherwise.
+    """
+    return winners(boards)
+
+
+def evaluate(boards):
+    """
+    Returns (winners, terminals, utilities) for every board, finding the
+    lines of each player only once.
+    """
+    x, o = to_masks(boards)
+    theWinners = first_winner(completed(x), completed(o))
+    over = (theWinners != EMPTY) | ((x | o) == bitboard.FULL)
+    return theWinners, over, theWinners.copy()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time batch evaluation of random boards.")
+    parser.add_argument("--boards", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    boards = rng.integers(-1, 2, size=(args.boards, 9), dtype=np.int8)
+    start = time.perf_counter()
+    theWinners, over, _ = evaluate(boards)
+    seconds = time.perf_counter() - start
+    print(f"Evaluated {args.boards} boards in {seconds:.3f}s: "
+          f"{np.count_nonzero(theWinners == X)} X wins, "
+          f"{np.count_nonzero(theWinners == O)} O wins, "
+          f"{np.count_nonzero(over)} finished.")
+
+
+if __name__ == "__main__":
+    main()
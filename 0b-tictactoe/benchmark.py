@@ -0,0 +1,75 @@
+"""
+Plays out every opening move with the computer on both sides and prints
+search statistics for each engine as JSON.
+
+usage ex. `python 0b-tictactoe/benchmark.py --engines list bitboard`
+"""
+
+import argparse
+import json
+
+import tictactoe as ttt
+
+ENGINES = ["list", "bitboard", "table"]
+
+
+def play_out(board, engine):
+    """
+    Lets the computer play both sides from board until the game is over,
+    returns the winner.
+    """
+    while not ttt.terminal(board):
+        board = ttt.result(board, ttt.minimax(board, engine=engine))
+    return ttt.winner(board)
+
+
+def run(engines=ENGINES, cold=False, order=None, seed=0):
+    """
+    Returns a JSON-able report of statistics per engine and opening.
+
+    Caches are cleared before each engine, and also before each opening
+    if cold is True. order sets tictactoe.MOVE_ORDER, and seed the choice
+    between equally good moves so runs can be repeated.
+    """
+    if order is not None:
+        ttt.MOVE_ORDER = order
+    report = {}
+    for engine in engines:
+        ttt.clear_caches()
+        ttt.seed(seed)
+        total = ttt.enable_stats()
+        openings = {}
+        initial = ttt.initial_state()
+        for action in sorted(ttt.actions(initial)):
+            if cold:
+                ttt.clear_caches()
+            stats = ttt.enable_stats()
+            theWinner = play_out(ttt.result(initial, action), engine)
+            openings[str(action)] = dict(stats.as_dict(), winner=theWinner)
+            total.nodes += stats.nodes
+            total.terminals += stats.terminals
+            total.cache_hits += stats.cache_hits
+            total.max_depth = max(total.max_depth, stats.max_depth)
+            total.move_times.extend(stats.move_times)
+        ttt.disable_stats()
+        report[engine] = {"openings": openings, "total": total.as_dict()}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Tic Tac Toe engines.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES,
+                        default=ENGINES)
+    parser.add_argument("--cold", action="store_true",
+                        help="clear the caches before every opening")
+    parser.add_argument("--order", choices=["center", "history", "rows"],
+                        help="move ordering of the list engine")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.engines, args.cold, args.order, args.seed),
+                     indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Bitboard Tic Tac Toe engine
+
+A state is a pair of 9-bit integer masks (x, o), where bit 3 * i + j is set
+if that player has a mark in cell (i, j). The functions mirror the
+tictactoe module, and to_bitboard / from_bitboard convert between the two.
+"""
+
+X = "X"
+O = "O"
+EMPTY = None
+
+FULL = 0b111111111
+
+# the 8 winning lines, as masks
+LINES = [
+    0b000000111, 0b000111000, 0b111000000,  # rows
+    0b001001001, 0b010010010, 0b100100100,  # columns
+    0b100010001, 0b001010100                # diagonals
+]
+
+# WINS[mask] is True if the cells in mask complete at least one line
+WINS = [any(mask & line == line for line in LINES) for mask in range(FULL + 1)]
+
+# cell masks in search order: the center, then corners, then edges, the
+# cells in the most lines first so alpha-beta prunes sooner
+MOVE_ORDER = [1 << 4, 1 << 0, 1 << 2, 1 << 6, 1 << 8,
+              1 << 1, 1 << 3, 1 << 5, 1 << 7]
+
+# POPCOUNT[mask] is the number of marks in mask
+POPCOUNT = [bin(mask).count("1") for mask in range(FULL + 1)]
+
+# the 8 rotations and reflections of the board, as maps of (i, j)
+SYMMETRIES = [
+    lambda i, j: (i, j),
+    lambda i, j: (j, 2 - i),
+    lambda i, j: (2 - i, 2 - j),
+    lambda i, j: (2 - j, i),
+    lambda i, j: (i, 2 - j),
+    lambda i, j: (2 - i, j),
+    lambda i, j: (j, i),
+    lambda i, j: (2 - j, 2 - i)
+]
+
+# CELL_MAPS[s][k] is where symmetry s moves cell number k
+CELL_MAPS = [
+    [3 * symmetry(*divmod(k, 3))[0] + symmetry(*divmod(k, 3))[1]
+     for k in range(9)]
+    for symmetry in SYMMETRIES
+]
+
+# MASK_MAPS[s][mask] is mask with every cell moved by symmetry s
+MASK_MAPS = [
+    [sum(1 << cells[k] for k in range(9) if mask >> k & 1)
+     for mask in range(FULL + 1)]
+    for cells in CELL_MAPS
+]
+
+# INVERSES[s] is the symmetry that undoes symmetry s
+INVERSES = [
+    next(t for t in range(8)
+         if all(CELL_MAPS[t][CELL_MAPS[s][k]] == k for k in range(9)))
+    for s in range(8)
+]
+
+
+def canonical(mine, theirs):
+    """
+    Returns (key, symmetry), where key identifies the position up to
+    rotation and reflection, the smallest mine | theirs << 9 over the 8
+    symmetries, and symmetry is the one that produced it.
+    """
+    best = None
+    for symmetry, masks in enumerate(MASK_MAPS):
+        key = masks[mine] | masks[theirs] << 9
+        if best is None or key < best:
+            best = key
+            bestSymmetry = symmetry
+    return best, bestSymmetry
+
+
+def bit(action):
+    """
+    Returns the mask of the cell (i, j).
+    """
+    return 1 << (3 * action[0] + action[1])
+
+
+def cell(index):
+    """
+    Returns the (i, j) action of bit number index.
+    """
+    return divmod(index, 3)
+
+
+def to_bitboard(board):
+    """
+    Converts a tictactoe list of lists board into an (x, o) state.
+    """
+    x = o = 0
+    for i in range(3):
+        for j in range(3):
+            if board[i][j] == X:
+                x |= bit((i, j))
+            elif board[i][j] == O:
+                o |= bit((i, j))
+    return (x, o)
+
+
+def from_bitboard(state):
+    """
+    Converts an (x, o) state into a tictactoe list of lists board.
+    """
+    x, o = state
+    board = [[EMPTY, EMPTY, EMPTY] for _ in range(3)]
+    for i in range(3):
+        for j in range(3):
+            if x & bit((i, j)):
+                board[i][j] = X
+            elif o & bit((i, j)):
+                board[i][j] = O
+    return board
+
+
+def initial_state():
+    """
+    Returns starting state of the board.
+    """
+    return (0, 0)
+
+
+def player(state):
+    """
+    Returns player who has the next turn on a board.
+    """
+    x, o = state
+    moves = POPCOUNT[x] + POPCOUNT[o]
+    if moves == 9:
+        return EMPTY
+    return X if moves % 2 == 0 else O
+
+
+def actions(state):
+    """
+    Returns list of all possible actions (i, j) available on the board,
+    center first, then corners, then edges.
+    """
+    empty = FULL & ~(state[0] | state[1])
+    return [cell(move.bit_length() - 1) for move in MOVE_ORDER if empty & move]
+
+
+def result(state, action):
+    """
+    Returns the state that results from making move (i, j) on the board.
+    """
+    x, o = state
+    move = bit(action)
+    nextMove = player(state)
+    if (x | o) & move or nextMove == EMPTY:
+        raise RuntimeError
+    if nextMove == X:
+        return (x | move, o)
+    return (x, o | move)
+
+
+def winner(state):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    if WINS[state[0]]:
+        return X
+    if WINS[state[1]]:
+        return O
+    return None
+
+
+def terminal(state):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    x, o = state
+    return WINS[x] or WINS[o] or (x | o) == FULL
+
+
+def utility(state):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    if WINS[state[0]]:
+        return 1
+    if WINS[state[1]]:
+        return -1
+    return 0
+
+
+# transposition table flags, as in tictactoe
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# maps the canonical key of a position (relative to the player to move) to
+# (value, flag), values are from the point of view of the player to move
+transposition_table = {}
+
+# maps the canonical key of a position to its optimal moves, as cell numbers
+# in the canonical orientation
+best_moves = {}
+
+# searchstats.SearchStats being collected, None while counting is switched off
+stats = None
+
+
+def minimax(state, rng=None):
+    """
+    Returns the optimal action for the current player on the board.
+
+    Ties between equally good moves are broken with rng.choice if a
+    random.Random is given, else the first in actions order is picked.
+    """
+    if terminal(state):
+        return None
+
+    x, o = state
+    mine, theirs = (x, o) if player(state) == X else (o, x)
+
+    # symmetric positions share one entry, stored in canonical orientation
+    key, symmetry = canonical(mine, theirs)
+    moves = best_moves.get(key)
+    if moves is not None and stats is not None:
+        stats.cache_hits += 1
+    if moves is None:
+        values = {}
+        for action in actions(state):
+            values[action] = -negamax(theirs, mine | bit(action), -2, 2)
+        bestVal = max(values.values())
+        moves = [CELL_MAPS[symmetry][3 * i + j]
+                 for (i, j), value in values.items() if value == bestVal]
+        best_moves[key] = moves
+
+    # map the stored moves back onto this board's orientation
+    inverse = CELL_MAPS[INVERSES[symmetry]]
+    if rng is None:
+        order = [3 * i + j for i, j in actions(state)]
+        return cell(min((inverse[move] for move in moves), key=order.index))
+    return cell(inverse[rng.choice(moves)])
+
+
+def negamax(mine, theirs, alpha, beta):
+    """
+    Returns the value of the position for the player to move, who owns the
+    cells in mine, searched with alpha-beta pruning inside (alpha, beta).
+    """
+    occupied = mine | theirs
+    if stats is not None:
+        stats.visit(POPCOUNT[occupied])
+        if WINS[theirs] or occupied == FULL:
+            stats.terminals += 1
+
+    # the opponent just moved, so only they can have completed a line
+    if WINS[theirs]:
+        return -1
+    if occupied == FULL:
+        return 0
+
+    window = (alpha, beta)
+    key = canonical(mine, theirs)[0]
+    entry = transposition_table.get(key)
+    if entry is not None:
+        if stats is not None:
+            stats.cache_hits += 1
+        value, flag = entry
+        if flag == EXACT:
+            return value
+        elif flag == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    value = -2
+    empty = FULL & ~occupied
+    for move in MOVE_ORDER:
+        if not empty & move:
+            continue
+        value = max(value, -negamax(theirs, mine | move, -beta, -alpha))
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break
+
+    if value <= window[0]:
+        flag = UPPER
+    elif value >= window[1]:
+        flag = LOWER
+    else:
+        flag = EXACT
+    transposition_table[key] = (value, flag)
+    return value
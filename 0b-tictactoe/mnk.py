@@ -0,0 +1,347 @@
+"""
+Generalized m,n,k game player
+
+Tic Tac Toe on a board of any size, where k marks in a row (horizontally,
+vertically or diagonally) wins. Boards are lists of lists just like in
+tictactoe.py, and MNKGame(3, 3, 3) plays plain Tic Tac Toe; the module level
+functions are that 3x3 game.
+
+minimax runs an iterative deepening alpha-beta search, so on boards too big
+to search to the end it scores cut off positions with a heuristic and stops
+deepening when its time budget runs out.
+
+usage ex. `python 0b-tictactoe/mnk.py --rows 4 --cols 4 --k 3 --time 1`
+"""
+
+import argparse
+import time
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# score of a won position, kept well above any heuristic score
+WIN = 1000000
+
+# how many nodes to search between checks of the clock
+CLOCK_INTERVAL = 1024
+
+
+class OutOfTime(Exception):
+    """
+    Raised inside a search when the time budget of the move runs out.
+    """
+
+
+class MNKGame():
+    """
+    Rules and search for an m by n board where k in a row wins.
+
+    Internally a board is a pair of bit masks, one per player, with bit
+    i * cols + j set for a mark in cell (i, j).
+    """
+
+    def __init__(self, rows=3, cols=3, k=3):
+        if k > max(rows, cols):
+            raise ValueError("k is longer than the board")
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.cells = rows * cols
+        self.full = (1 << self.cells) - 1
+
+        # every run of k cells, as a mask
+        self.lines = []
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i = i + di * (k - 1)
+                    end_j = j + dj * (k - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < cols:
+                        self.lines.append(sum(
+                            1 << ((i + di * step) * cols + j + dj * step)
+                            for step in range(k)))
+
+        # lines_through[c] are the lines that include cell number c, the only
+        # ones a move on c can complete
+        self.lines_through = [
+            [line for line in self.lines if line >> c & 1]
+            for c in range(self.cells)
+        ]
+
+        # cells closest to the center first, they take part in the most lines
+        # so searching them first prunes the most
+        center_i = (rows - 1) / 2
+        center_j = (cols - 1) / 2
+        self.order = sorted(
+            range(self.cells),
+            key=lambda c: (abs(c // cols - center_i) + abs(c % cols - center_j), c))
+
+        # maps (mine, theirs) to (depth, value, flag, best cell)
+        self.transposition_table = {}
+        self.nodes = 0
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return [[EMPTY] * self.cols for _ in range(self.rows)]
+
+    def player(self, board):
+        """
+        Returns player who has the next turn on a board.
+        """
+        x, o = self.to_masks(board)
+        moves = bin(x | o).count("1")
+        if moves == self.cells:
+            return EMPTY
+        return X if moves % 2 == 0 else O
+
+    def actions(self, board):
+        """
+        Returns list of all possible actions (i, j) available on the board.
+        """
+        return [(i, j) for i in range(self.rows) for j in range(self.cols)
+                if board[i][j] == EMPTY]
+
+    def result(self, board, action):
+        """
+        Returns the board that results from making move (i, j) on the board.
+        """
+        i, j = action
+        nextMove = self.player(board)
+        if not (0 <= i < self.rows and 0 <= j < self.cols) \
+                or board[i][j] != EMPTY or nextMove == EMPTY:
+            raise RuntimeError
+        boardCopy = [list(row) for row in board]
+        boardCopy[i][j] = nextMove
+        return boardCopy
+
+    def winner(self, board):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        x, o = self.to_masks(board)
+        if self.has_line(x):
+            return X
+        if self.has_line(o):
+            return O
+        return None
+
+    def terminal(self, board):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        x, o = self.to_masks(board)
+        return self.has_line(x) or self.has_line(o) or (x | o) == self.full
+
+    def utility(self, board):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        theWinner = self.winner(board)
+        if theWinner == X:
+            return 1
+        elif theWinner == O:
+            return -1
+        return 0
+
+    def minimax(self, board, time_limit=None, max_depth=None):
+        """
+        Returns the best action found for the current player on the board.
+
+        The search deepens one ply at a time until it reaches the end of
+        the game, max_depth plies, or time_limit seconds, and returns the
+        best move of the deepest search that finished. A depth 1 search
+        always finishes, so a move is returned however short the budget.
+        """
+        if self.terminal(board):
+            return None
+
+        x, o = self.to_masks(board)
+        mine, theirs = (x, o) if self.player(board) == X else (o, x)
+        empty = self.cells - bin(x | o).count("1")
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        limit = empty if max_depth is None else min(max_depth, empty)
+
+        self.nodes = 0
+        best = None
+        for depth in range(1, limit + 1):
+            try:
+                value, cell = self.search_root(
+                    mine, theirs, depth, deadline if best is not None else None)
+            except OutOfTime:
+                break
+            best = cell
+            # a forced win or loss will not change with a deeper search
+            if abs(value) >= WIN:
+                break
+        return divmod(best, self.cols)
+
+    def search_root(self, mine, theirs, depth, deadline):
+        """
+        Returns (value, cell) of the best move found by a depth limited search.
+        """
+        alpha = -2 * WIN
+        bestCell = None
+        for cell in self.ordered_moves(mine, theirs):
+            value = -self.negamax(theirs, mine | 1 << cell, cell,
+                                  depth - 1, -2 * WIN, -alpha, deadline)
+            if bestCell is None or value > alpha:
+                alpha = value
+                bestCell = cell
+        self.transposition_table[(mine, theirs)] = (depth, alpha, EXACT, bestCell)
+        return alpha, bestCell
+
+    def negamax(self, mine, theirs, last, depth, alpha, beta, deadline):
+        """
+        Returns the value of the position for the player to move, who owns
+        the cells in mine, after the opponent played cell number last.
+        """
+        self.nodes += 1
+        if deadline is not None and self.nodes % CLOCK_INTERVAL == 0 \
+                and time.perf_counter() > deadline:
+            raise OutOfTime
+
+        empty = self.cells - bin(mine | theirs).count("1")
+
+        # only the move just made can have completed a line, faster wins
+        # (more empty cells left) score higher
+        for line in self.lines_through[last]:
+            if theirs & line == line:
+                return -(WIN + empty)
+        if empty == 0:
+            return 0
+        if depth == 0:
+            return self.evaluate(mine, theirs)
+
+        window = (alpha, beta)
+        key = (mine, theirs)
+        entry = self.transposition_table.get(key)
+        tableCell = None
+        if entry is not None:
+            entryDepth, value, flag, tableCell = entry
+            if entryDepth >= depth:
+                if flag == EXACT:
+                    return value
+                elif flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        value = -2 * WIN
+        bestCell = None
+        for cell in self.ordered_moves(mine, theirs, tableCell):
+            score = -self.negamax(theirs, mine | 1 << cell, cell,
+                                  depth - 1, -beta, -alpha, deadline)
+            if score > value:
+                value = score
+                bestCell = cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if value <= window[0]:
+            flag = UPPER
+        elif value >= window[1]:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.transposition_table[key] = (depth, value, flag, bestCell)
+        return value
+
+    def ordered_moves(self, mine, theirs, first=None):
+        """
+        Returns the empty cells, starting with first (usually the best move
+        from an earlier search) and then closest to the center.
+        """
+        if first is None:
+            entry = self.transposition_table.get((mine, theirs))
+            if entry is not None:
+                first = entry[3]
+        occupied = mine | theirs
+        moves = [cell for cell in self.order
+                 if not occupied >> cell & 1 and cell != first]
+        if first is not None:
+            moves.insert(0, first)
+        return moves
+
+    def evaluate(self, mine, theirs):
+        """
+        Returns a heuristic score for the player to move, counting every
+        line only one player can still complete, weighted by how far along
+        it is.
+        """
+        score = 0
+        for line in self.lines:
+            ours = mine & line
+            others = theirs & line
+            if ours and not others:
+                score += 4 ** bin(ours).count("1")
+            elif others and not ours:
+                score -= 4 ** bin(others).count("1")
+        return score
+
+    def has_line(self, mask):
+        return any(mask & line == line for line in self.lines)
+
+    def to_masks(self, board):
+        """
+        Returns the (x, o) masks of a list of lists board.
+        """
+        x = o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    x |= 1 << (i * self.cols + j)
+                elif cell == O:
+                    o |= 1 << (i * self.cols + j)
+        return x, o
+
+
+# transposition table flags, as in tictactoe
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# the classic 3x3 game, under the same names tictactoe.py uses
+game = MNKGame(3, 3, 3)
+initial_state = game.initial_state
+player = game.player
+actions = game.actions
+result = game.result
+winner = game.winner
+terminal = game.terminal
+utility = game.utility
+minimax = game.minimax
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Let the computer play an m,n,k game against itself.")
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--cols", type=int, default=3)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--time", type=float, default=1.0,
+                        help="seconds per move")
+    args = parser.parse_args()
+
+    mnk = MNKGame(args.rows, args.cols, args.k)
+    board = mnk.initial_state()
+    while not mnk.terminal(board):
+        start = time.perf_counter()
+        move = mnk.minimax(board, time_limit=args.time)
+        seconds = time.perf_counter() - start
+        print(f"{mnk.player(board)} plays {move} "
+              f"({mnk.nodes} nodes, {seconds:.2f}s)")
+        board = mnk.result(board, move)
+    for row in board:
+        print(" ".join(cell or "." for cell in row))
+    theWinner = mnk.winner(board)
+    print(f"Game Over: {theWinner} wins." if theWinner else "Game Over: Tie.")
+
+
+if __name__ == "__main__":
+    main()
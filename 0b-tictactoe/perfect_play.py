@@ -0,0 +1,123 @@
+"""
+Perfect play table for Tic Tac Toe
+
+Every reachable position is solved once and stored in a file of 3 ** 9
+16-bit entries, indexed by the base 3 encoding of the board (cell (i, j) is
+digit 3 * i + j, 0 for empty, 1 for X and 2 for O). The low 9 bits of an
+entry are the mask of optimal moves (bit 3 * i + j for move (i, j)) and the
+next 2 bits hold the value of the position plus 1. Unreachable positions
+are stored as UNREACHABLE.
+
+usage ex. `python 0b-tictactoe/perfect_play.py` to build the table
+"""
+
+import os
+import sys
+from array import array
+
+import bitboard
+
+# default location of the table, next to this file
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "perfect_play.bin")
+
+UNREACHABLE = 0xFFFF
+
+# POWERS[k] is 3 ** k, the place value of cell number k
+POWERS = [3 ** k for k in range(9)]
+
+
+def encode(state):
+    """
+    Returns the base 3 index of an (x, o) bitboard state.
+    """
+    x, o = state
+    index = 0
+    for k in range(9):
+        if x >> k & 1:
+            index += POWERS[k]
+        elif o >> k & 1:
+            index += 2 * POWERS[k]
+    return index
+
+
+def build():
+    """
+    Solves every reachable position and returns the table as an array.
+    """
+    table = array("H", [UNREACHABLE]) * 3 ** 9
+
+    def solve(state):
+        """
+        Fills in the entry for state and returns its value for X.
+        """
+        index = encode(state)
+        if table[index] != UNREACHABLE:
+            return (table[index] >> 9) - 1
+        if bitboard.terminal(state):
+            value = bitboard.utility(state)
+            table[index] = (value + 1) << 9
+            return value
+
+        sign = 1 if bitboard.player(state) == bitboard.X else -1
+        values = {}
+        for action in bitboard.actions(state):
+            values[action] = solve(bitboard.result(state, action))
+        value = sign * max(sign * value for value in values.values())
+        moves = 0
+        for action, action_value in values.items():
+            if action_value == value:
+                moves |= bitboard.bit(action)
+        table[index] = (value + 1) << 9 | moves
+        return value
+
+    solve(bitboard.initial_state())
+    return table
+
+
+def save(table, path=TABLE_PATH):
+    with open(path, "wb") as f:
+        table.tofile(f)
+
+
+def load(path=TABLE_PATH):
+    """
+    Reads a table written by save, raising OSError if it is missing
+    and ValueError if it is not a table.
+    """
+    table = array("H")
+    with open(path, "rb") as f:
+        try:
+            table.fromfile(f, 3 ** 9)
+        except EOFError:
+            raise ValueError(f"{path} is not a perfect play table")
+        if f.read(1):
+            raise ValueError(f"{path} is not a perfect play table")
+    return table
+
+
+def lookup(table, state):
+    """
+    Returns (value, moves) for an (x, o) state, where value is 1 if X wins
+    with perfect play, -1 if O wins and 0 for a tie, and moves is the list
+    of optimal (i, j) actions (empty for finished games).
+
+    Returns None if the position cannot be reached in a real game.
+    """
+    entry = table[encode(state)]
+    if entry == UNREACHABLE:
+        return None
+    moves = [bitboard.cell(k) for k in range(9) if entry >> k & 1]
+    return (entry >> 9) - 1, moves
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) == 2 else TABLE_PATH
+    table = build()
+    save(table, path)
+    reachable = sum(1 for entry in table if entry != UNREACHABLE)
+    print(f"Solved {reachable} positions, saved to {path}.")
+
+
+if __name__ == "__main__":
+    main()
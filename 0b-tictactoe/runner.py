@@ -1,12 +1,25 @@
 import pygame
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
+import mnk
 import tictactoe as ttt
 
 pygame.init()
 size = width, height = 600, 400
 
+# optional time limit for the computer's move in seconds, e.g.
+# `python 0b-tictactoe/runner.py 2`, the move is then found by the iterative
+# deepening search of mnk, which plays its best move so far when time is up
+ai_time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else None
+
+# shortest time the computer appears to think, so its moves are not instant,
+# never longer than the time limit
+ai_min_delay = 0.5
+if ai_time_limit is not None:
+    ai_min_delay = min(ai_min_delay, ai_time_limit)
+
 # Colors
 black = (0, 0, 0)
 white = (255, 255, 255)
@@ -20,9 +33,16 @@ moveFont = pygame.font.Font("0b-tictactoe/OpenSans-Regular.ttf", 60)
 
 user = None
 board = ttt.initial_state()
-ai_turn = False
+
+# the computer searches in a background thread so the window keeps
+# repainting and handling events, ai_move is the pending search
+executor = ThreadPoolExecutor(max_workers=1)
+ai_move = None
+ai_started = None
+clock = pygame.time.Clock()
 
 while True:
+    clock.tick(30)
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -103,21 +123,28 @@ while True:
         elif user == player:
             title = f"Play as {user}"
         else:
-            title = f"Computer thinking..."
+            # animate the dots so it is clear the window is not frozen
+            dots = "." * (1 + int(time.time() * 2) % 3)
+            title = f"Computer thinking{dots:<3}"
         title = largeFont.render(title, True, white)
         titleRect = title.get_rect()
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
-        # Check for AI move
+        # Check for AI move, start a search then poll it on later frames
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if ai_move is None:
+                if ai_time_limit is None:
+                    ai_move = executor.submit(ttt.minimax, board)
+                else:
+                    # the search stops itself at the time limit, so the
+                    # worker is free again for the next move
+                    ai_move = executor.submit(
+                        mnk.minimax, board, time_limit=ai_time_limit)
+                ai_started = time.time()
+            elif ai_move.done() and time.time() - ai_started >= ai_min_delay:
+                board = ttt.result(board, ai_move.result())
+                ai_move = None
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
@@ -142,6 +169,6 @@ while True:
                     time.sleep(0.2)
                     user = None
                     board = ttt.initial_state()
-                    ai_turn = False
+                    ai_move = None
 
     pygame.display.flip()
@@ -0,0 +1,61 @@
+"""
+Search statistics for the Tic Tac Toe engines
+
+The engines keep a module level `stats` that is None unless counting is
+switched on (see tictactoe.enable_stats), so the only cost when disabled is
+one None check per node.
+"""
+
+import time
+
+
+class SearchStats():
+    """
+    Counters collected while searching.
+
+    nodes are positions visited by the search functions, terminals the
+    finished games among them, cache_hits the positions found in a cache,
+    and max_depth the furthest a search looked past the position it was
+    asked about. move_times has the seconds taken by each minimax call.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.terminals = 0
+        self.cache_hits = 0
+        self.max_depth = 0
+        self.move_times = []
+        self.root_marks = 0
+        self.started = None
+
+    def start_move(self, marks):
+        """
+        Marks the start of a minimax call on a board with marks filled cells.
+        """
+        self.root_marks = marks
+        self.started = time.perf_counter()
+
+    def end_move(self):
+        self.move_times.append(time.perf_counter() - self.started)
+
+    def visit(self, marks):
+        """
+        Counts a visit to a position with marks filled cells.
+        """
+        self.nodes += 1
+        depth = marks - self.root_marks
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def as_dict(self):
+        times = self.move_times
+        return {
+            "nodes": self.nodes,
+            "terminals": self.terminals,
+            "cache_hits": self.cache_hits,
+            "max_depth": self.max_depth,
+            "moves": len(times),
+            "total_seconds": sum(times),
+            "mean_seconds": sum(times) / len(times) if times else 0.0,
+            "max_seconds": max(times, default=0.0)
+        }
@@ -6,10 +6,52 @@ import math
 import copy
 import random
 
+import bitboard
+import perfect_play
+from searchstats import SearchStats
+
 X = "X"
 O = "O"
 EMPTY = None
 
+# search used by minimax: "table" reads the answer from the perfect play
+# table (see perfect_play.py) and falls back to "bitboard" if there is no
+# table, "bitboard" searches a converted copy of the board with the bitboard
+# engine, "list" searches the list of lists board directly
+ENGINE = "table"
+
+# the perfect play table, loaded on first use, False if it is unavailable
+perfect_play_table = None
+
+# SearchStats being collected, None while counting is switched off
+stats = None
+
+# order actions lists moves in: "center" tries the center, then corners,
+# then edges, "history" tries moves that caused the most cutoffs in earlier
+# searches first (then falls back to "center"), "rows" is plain row by row
+MOVE_ORDER = "center"
+
+# (i, j) cells in "center" order
+CENTER_FIRST = [(1, 1), (0, 0), (0, 2), (2, 0), (2, 2),
+                (0, 1), (1, 0), (1, 2), (2, 1)]
+
+# history heuristic scores for "history" ordering, maps actions to how
+# much search they have saved by causing cutoffs
+history = {}
+
+# when True minimax shuffles the moves at the root once, so that it picks
+# at random between equally good moves. The search below the root is always
+# deterministic, and seed makes the root choice repeatable too
+RANDOM_ROOT = True
+rng = random.Random()
+
+
+def seed(value=None):
+    """
+    Seeds the random choice between equally good moves at the root.
+    """
+    rng.seed(value)
+
 
 def initial_state():
     """
@@ -41,17 +83,17 @@ def player(board):
 
 def actions(board):
     """
-    Returns set of all possible actions (i, j) available on the board.
+    Returns set of all possible actions (i, j) available on the board,
+    listed in MOVE_ORDER.
     """
-
-    actionList = list()
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
-                actionTuple = (i, j)
-                actionList.append(actionTuple)
-    random.seed()
-    random.shuffle(actionList)
+    if MOVE_ORDER == "rows":
+        return [(i, j) for i in range(3) for j in range(3)
+                if board[i][j] == EMPTY]
+
+    actionList = [(i, j) for i, j in CENTER_FIRST if board[i][j] == EMPTY]
+    if MOVE_ORDER == "history":
+        # sort is stable, so ties stay in center order
+        actionList.sort(key=lambda action: -history.get(action, 0))
     return actionList
 
 
@@ -134,16 +176,101 @@ def utility(board):
         return 0
 
 
-def minimax(board):
+def board_key(board):
+    """
+    Returns a hashable encoding of the board, used as a transposition table key.
+    """
+    return tuple(tuple(row) for row in board)
+
+
+def lookup(board):
+    """
+    Returns (value, optimal actions) for the board from the perfect play
+    table, or None if there is no table.
+    """
+    global perfect_play_table
+    if perfect_play_table is None:
+        try:
+            perfect_play_table = perfect_play.load()
+        except (OSError, ValueError):
+            perfect_play_table = False
+    if perfect_play_table is False:
+        return None
+    return perfect_play.lookup(perfect_play_table, bitboard.to_bitboard(board))
+
+
+def enable_stats():
+    """
+    Starts counting search statistics in every engine, returns the
+    SearchStats the counts go to.
+    """
+    global stats
+    stats = bitboard.stats = SearchStats()
+    return stats
+
+
+def disable_stats():
+    global stats
+    stats = bitboard.stats = None
+
+
+def clear_caches():
+    """
+    Forgets every cached search result, so the next searches start cold.
+    """
+    transposition_table.clear()
+    history.clear()
+    bitboard.transposition_table.clear()
+    bitboard.best_moves.clear()
+
+
+def marks(board):
+    """
+    Returns the number of filled cells on the board.
+    """
+    return sum(cell != EMPTY for row in board for cell in row)
+
+
+def minimax(board, engine=None):
     """
     Returns the optimal action for the current player on the board.
+
+    engine picks the search, defaulting to ENGINE.
+    """
+    if stats is None:
+        return search(board, engine)
+    stats.start_move(marks(board))
+    action = search(board, engine)
+    stats.end_move()
+    return action
+
+
+def search(board, engine=None):
+    """
+    Does the work of minimax.
     """
 
     # return None for boards in terminal state
     if terminal(board):
         return None
 
-    # figure out if we are trying to min or max based on who's move it is
+    engine = engine or ENGINE
+    rootRng = rng if RANDOM_ROOT else None
+    if engine == "table":
+        found = lookup(board)
+        if found is not None:
+            # every listed move is optimal, pick one like the searches do
+            return rootRng.choice(found[1]) if rootRng else found[1][0]
+        engine = "bitboard"
+    if engine == "bitboard":
+        return bitboard.minimax(bitboard.to_bitboard(board), rootRng)
+    elif engine != "list":
+        raise ValueError(f"unknown engine {engine!r}")
+
+    # figure out if we are trying to min or max based on who's move it is,
+    # the window is narrowed as better moves are found so later moves can be pruned
+    alpha = -math.inf
+    beta = math.inf
     if player(board) == X:
         goal = 'max'
         currBestVal = -math.inf
@@ -152,33 +279,127 @@ def minimax(board):
         currBestVal = math.inf
 
     possibleActions = actions(board)
+    if rootRng:
+        rootRng.shuffle(possibleActions)
     for action in possibleActions:
         if goal == 'max':
-            currActionVal = min_value(result(board, action))
+            currActionVal = min_value(result(board, action), alpha, beta)
             if currActionVal > currBestVal:
                 currBestVal = currActionVal
                 bestAction = action
+            alpha = max(alpha, currBestVal)
         else:
-            currActionVal = max_value(result(board, action))
+            currActionVal = max_value(result(board, action), alpha, beta)
             if currActionVal < currBestVal:
                 currBestVal = currActionVal
                 bestAction = action
+            beta = min(beta, currBestVal)
     return bestAction
 
 
-def max_value(board):
+# transposition table entry flags, whether a stored value is exact or only
+# a lower / upper bound because the search that produced it was cut off
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# maps board_key(board) to (value, flag), shared by every search since the
+# value of a position never changes
+transposition_table = {}
+
+
+def probe(board, alpha, beta):
+    """
+    Looks the board up in the transposition table.
+
+    Returns (value, alpha, beta), where value is not None if the stored entry
+    already settles the search, and alpha / beta are narrowed by any bound.
+    """
+    entry = transposition_table.get(board_key(board))
+    if entry is not None:
+        if stats is not None:
+            stats.cache_hits += 1
+        value, flag = entry
+        if flag == EXACT:
+            return value, alpha, beta
+        elif flag == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value, alpha, beta
+    return None, alpha, beta
+
+
+def store(board, value, alpha, beta):
+    """
+    Saves a search result in the transposition table, given the window
+    (alpha, beta) the search was started with.
+    """
+    if value <= alpha:
+        flag = UPPER
+    elif value >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    transposition_table[board_key(board)] = (value, flag)
+
+
+def record_cutoff(board, action):
+    """
+    Credits action with a cutoff for "history" ordering, weighted by the
+    size of the subtree it saved.
+    """
+    if MOVE_ORDER == "history":
+        remaining = 9 - marks(board)
+        history[action] = history.get(action, 0) + remaining * remaining
+
+
+def max_value(board, alpha=-math.inf, beta=math.inf):
+    if stats is not None:
+        stats.visit(marks(board))
+    value, alpha, beta = probe(board, alpha, beta)
+    if value is not None:
+        return value
     if terminal(board):
-        return utility(board)
+        if stats is not None:
+            stats.terminals += 1
+        value = utility(board)
+        transposition_table[board_key(board)] = (value, EXACT)
+        return value
+    window = (alpha, beta)
     value = -math.inf
     for action in actions(board):
-        value = max(value, min_value(result(board, action)))
+        value = max(value, min_value(result(board, action), alpha, beta))
+        alpha = max(alpha, value)
+        # min player would never allow this position, stop looking
+        if alpha >= beta:
+            record_cutoff(board, action)
+            break
+    store(board, value, *window)
     return value
 
 
-def min_value(board):
+def min_value(board, alpha=-math.inf, beta=math.inf):
+    if stats is not None:
+        stats.visit(marks(board))
+    value, alpha, beta = probe(board, alpha, beta)
+    if value is not None:
+        return value
     if terminal(board):
-        return utility(board)
+        if stats is not None:
+            stats.terminals += 1
+        value = utility(board)
+        transposition_table[board_key(board)] = (value, EXACT)
+        return value
+    window = (alpha, beta)
     value = math.inf
     for action in actions(board):
-        value = min(value, max_value(result(board, action)))
+        value = min(value, max_value(result(board, action), alpha, beta))
+        beta = min(beta, value)
+        # max player would never allow this position, stop looking
+        if alpha >= beta:
+            record_cutoff(board, action)
+            break
+    store(board, value, *window)
     return value
@@ -1,19 +1,91 @@
 import itertools
+import weakref
+
+import sat
 
 
 class Sentence():
+    __slots__ = ("_hash", "_symbols", "_fixed", "__weakref__")
+
+    # Every kind of sentence but And is hash-consed: building one equal to a
+    # sentence that already exists returns that sentence, so equal sentences
+    # are shared and usually compare by identity. Maps the class and the
+    # name or operands (by id, as they are shared too) to the sentence
+    interned = weakref.WeakValueDictionary()
+
+    @classmethod
+    def intern(cls, key, operands, **fields):
+        """Returns the sentence stored under key, creating it with fields if
+        there is none yet. The new sentence is fixed, caching its hash and
+        symbols, unless one of its operands contains an And."""
+        sentence = Sentence.interned.get(key)
+        if sentence is None:
+            sentence = object.__new__(cls)
+            for name, value in fields.items():
+                setattr(sentence, name, value)
+            sentence._hash = None
+            sentence._symbols = None
+            sentence._fixed = all(operand._fixed for operand in operands)
+            Sentence.interned[key] = sentence
+        return sentence
+
+    # Sentences pickle as their class and operands only (see __reduce__ in
+    # the subclasses), so loading one goes through interning and never
+    # copies a cached hash, which depends on the hash seed of the process
+    # that wrote it, onto a live sentence
+
+    def __hash__(self):
+        if getattr(self, "_hash", None) is None:
+            value = self.find_hash()
+            # And.add can change the hash of anything containing an And
+            if not getattr(self, "_fixed", False):
+                return value
+            self._hash = value
+        return self._hash
+
+    def find_hash(self):
+        """Returns the hash of the logical sentence."""
+        return object.__hash__(self)
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """Evaluates the logical sentence in a model that may leave symbols
+        out, returning None if its value depends on them."""
+        raise Exception("nothing to evaluate")
+
+    def compile(self, index):
+        """Returns a function f(values, full) evaluating the sentence, where
+        values[index[name]] is the value of symbol name.
+
+        The function only combines values with &, | and ^ full, so it works
+        on bools with full True, on Python ints holding one model per bit
+        with full the mask of all of them, and on NumPy boolean arrays."""
+        raise Exception("nothing to compile")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.symbol_set())
+
+    def symbol_set(self):
+        """Returns a frozenset of all symbols in the logical sentence, found
+        once and then cached if the sentence is fixed."""
+        if getattr(self, "_symbols", None) is None:
+            symbols = self.find_symbols()
+            if not getattr(self, "_fixed", False):
+                return symbols
+            self._symbols = symbols
+        return self._symbols
+
+    def find_symbols(self):
+        """Returns a frozenset of all symbols in the logical sentence."""
+        return frozenset()
 
     @classmethod
     def validate(cls, sentence):
@@ -43,14 +115,21 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
+    def __new__(cls, name):
+        return cls.intern((cls, name), (), name=name)
+
+    def __reduce__(self):
+        return (type(self), (self.name,))
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(("symbol", self.name))
 
     def __repr__(self):
@@ -62,22 +141,38 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
+    def compile(self, index):
+        position = index[self.name]
+        return lambda values, full: values[position]
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def find_symbols(self):
+        return frozenset((self.name,))
 
 
 class Not(Sentence):
-    def __init__(self, operand):
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+        return cls.intern((cls, id(operand)), (operand,), operand=operand)
+
+    def __reduce__(self):
+        return (type(self), (self.operand,))
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(("not", hash(self.operand)))
 
     def __repr__(self):
@@ -86,23 +181,46 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
+    def compile(self, index):
+        operand = self.operand.compile(index)
+        return lambda values, full: full ^ operand(values, full)
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def find_symbols(self):
+        return self.operand.symbol_set()
 
 
 class And(Sentence):
+    """A conjunction. Unlike the other sentences it is not hash-consed, as
+    add changes it, and two knowledge bases that happen to start out the
+    same must not turn into one. For the same reason neither it nor any
+    sentence containing it is fixed."""
+    __slots__ = ("conjuncts",)
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
+        self._hash = None
+        self._symbols = None
+        self._fixed = False
+
+    def __reduce__(self):
+        return (type(self), tuple(self.conjuncts))
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And) and self.conjuncts == other.conjuncts)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(
             ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
         )
@@ -114,32 +232,86 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        """Adds a conjunct. Sentences already built on top of this one see
+        the change too:
+
+        >>> A, B, C = Symbol("A"), Symbol("B"), Symbol("C")
+        >>> k = And(A)
+        >>> x = Implication(k, C)
+        >>> sorted(x.symbols())
+        ['A', 'C']
+        >>> k.add(B)
+        >>> sorted(x.symbols())
+        ['A', 'B', 'C']
+        >>> model_check(x, C), model_check(x, C, engine="compiled")
+        (False, False)
+        >>> model_check(x, C, engine="sat"), KnowledgeBase(x).entails(C)
+        (False, False)
+        >>> Not(k) == Not(And(A, B)) and hash(Not(k)) == hash(Not(And(A, B)))
+        True
+        """
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
+    def compile(self, index):
+        parts = [conjunct.compile(index) for conjunct in self.conjuncts]
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 2:
+            first, second = parts
+            return lambda values, full: first(values, full) & second(values, full)
+
+        def conjunction(values, full):
+            result = full
+            for part in parts:
+                result = result & part(values, full)
+            return result
+        return conjunction
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def find_symbols(self):
+        return frozenset().union(
+            *[conjunct.symbol_set() for conjunct in self.conjuncts])
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        return cls.intern(
+            (cls,) + tuple(id(disjunct) for disjunct in disjuncts),
+            disjuncts, disjuncts=list(disjuncts))
+
+    def __reduce__(self):
+        return (type(self), tuple(self.disjuncts))
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and self.disjuncts == other.disjuncts)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(
             ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
         )
@@ -151,29 +323,64 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
+    def compile(self, index):
+        parts = [disjunct.compile(index) for disjunct in self.disjuncts]
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 2:
+            first, second = parts
+            return lambda values, full: first(values, full) | second(values, full)
+
+        def disjunction(values, full):
+            result = full ^ full
+            for part in parts:
+                result = result | part(values, full)
+            return result
+        return disjunction
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def find_symbols(self):
+        return frozenset().union(
+            *[disjunct.symbol_set() for disjunct in self.disjuncts])
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        return cls.intern(
+            (cls, id(antecedent), id(consequent)), (antecedent, consequent),
+            antecedent=antecedent, consequent=consequent)
+
+    def __reduce__(self):
+        return (type(self), (self.antecedent, self.consequent))
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(("implies", hash(self.antecedent), hash(self.consequent)))
 
     def __repr__(self):
@@ -183,28 +390,54 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
+    def compile(self, index):
+        antecedent = self.antecedent.compile(index)
+        consequent = self.consequent.compile(index)
+        return lambda values, full: ((full ^ antecedent(values, full))
+                                     | consequent(values, full))
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def find_symbols(self):
+        return self.antecedent.symbol_set() | self.consequent.symbol_set()
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        return cls.intern(
+            (cls, id(left), id(right)), (left, right),
+            left=left, right=right)
+
+    def __reduce__(self):
+        return (type(self), (self.left, self.right))
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional)
+            and self.left == other.left
+            and self.right == other.right)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(("biconditional", hash(self.left), hash(self.right)))
 
     def __repr__(self):
@@ -216,48 +449,261 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
+    def compile(self, index):
+        left = self.left.compile(index)
+        right = self.right.compile(index)
+        return lambda values, full: full ^ left(values, full) ^ right(values, full)
+
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def find_symbols(self):
+        return self.left.symbol_set() | self.right.symbol_set()
+
 
+def model_check(knowledge, query, engine="enumerate"):
+    """Checks if knowledge base entails query.
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    engine "enumerate" goes through the models, skipping every group of
+    them that a partial assignment already decides, "compiled" evaluates
+    all models many at a time with Compiled, and "sat" asks sat.Solver
+    whether knowledge and not query can be true together, which scales to
+    far more symbols.
+    """
+    if engine == "sat":
+        return sat.entails(knowledge, query)
+    elif engine == "compiled":
+        counterexamples = Compiled(And(knowledge, Not(query)))
+        return not any(mask for _, mask in counterexamples.models())
+    elif engine != "enumerate":
+        raise ValueError(f"unknown engine {engine!r}")
 
     def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+        """Checks if knowledge base entails query, given a partial model.
 
-        # If model has an assignment for each symbol
-        if not symbols:
+        The model is extended in place, symbols[len(model)] being the next
+        symbol to assign, and is back as it was when this returns.
+        """
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
+        # A model where the knowledge base is false can never be a
+        # counterexample, however the remaining symbols are assigned
+        known = knowledge.evaluate_partial(model)
+        if known is False:
             return True
-        else:
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+        # Nor can one where the query is already true
+        answer = query.evaluate_partial(model)
+        if answer is True:
+            return True
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
+        # The knowledge base holds but the query fails, whatever is left
+        if answer is False and known is True:
+            return False
+
+        # Try both values of the next symbol, undoing the assignment after
+        p = symbols[len(model)]
+        for value in (True, False):
+            model[p] = value
+            entailed = check_all(knowledge, query, symbols, model)
+            del model[p]
+            if not entailed:
+                return False
+        return True
+
+    # Assign the most constrained symbols first, the ones in the most
+    # conjuncts, so that sentences are decided as early as possible
+    counts = {}
+    for sentence in conjuncts(knowledge) + [query]:
+        for symbol in sentence.symbols():
+            counts[symbol] = counts.get(symbol, 0) + 1
+    symbols = sorted(counts, key=lambda symbol: (-counts[symbol], symbol))
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+    # Check that knowledge entails query
+    return check_all(knowledge, query, symbols, dict())
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+def conjuncts(sentence):
+    """Returns the conjuncts of sentence, with nested conjunctions flattened."""
+    if not isinstance(sentence, And):
+        return [sentence]
+    return [part for conjunct in sentence.conjuncts
+            for part in conjuncts(conjunct)]
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+
+class Compiled():
+    """A sentence compiled for fast evaluation, see Sentence.compile.
+
+    Symbols are numbered in sorted order unless given, and model number m
+    assigns symbol k the value of bit k of m.
+    """
+
+    def __init__(self, sentence, symbols=None):
+        if symbols is None:
+            symbols = sorted(sentence.symbols())
+        self.sentence = sentence
+        self.symbols = list(symbols)
+        self.function = sentence.compile(
+            {name: k for k, name in enumerate(self.symbols)})
+
+    def evaluate(self, model):
+        """Evaluates the sentence in a model dict."""
+        return bool(self.function(
+            [bool(model[name]) for name in self.symbols], True))
+
+    def evaluate_many(self, values, full):
+        """Evaluates the sentence for many models at once, values holding
+        one Python int or NumPy boolean array per symbol, see
+        Sentence.compile."""
+        return self.function(values, full)
+
+    def models(self, chunk=16):
+        """Yields (first, mask) for every group of 2 ** chunk models, in
+        order, where bit i of mask is set if model first + i makes the
+        sentence true."""
+        count = len(self.symbols)
+        width = min(count, chunk)
+        size = 1 << width
+        full = (1 << size) - 1
+
+        # the symbols below width change within a group, following the
+        # bits of the model numbers, the rest are the same for the group
+        patterns = []
+        for k in range(width):
+            run = 1 << k
+            pattern = ((1 << run) - 1) << run
+            length = 2 * run
+            while length < size:
+                pattern |= pattern << length
+                length *= 2
+            patterns.append(pattern)
+
+        for group in range(1 << (count - width)):
+            values = patterns + [full if group >> (k - width) & 1 else 0
+                                 for k in range(width, count)]
+            yield group << width, self.function(values, full)
+
+
+class KnowledgeBase():
+    """Sentences known to be true, for asking many entailment queries.
+
+    engine "models" finds every model of the knowledge base once, as the
+    bits of an int (bit m for model m, see Compiled), and only narrows them
+    down as sentences are added. "sat" keeps one sat.Solver that is given
+    the clauses of each new sentence, for knowledge bases with too many
+    symbols to go through their models.
+    """
+
+    def __init__(self, *sentences, engine="models"):
+        if engine not in ("models", "sat"):
+            raise ValueError(f"unknown engine {engine!r}")
+        self.engine = engine
+        self.sentences = []
+
+        # symbol names in the order they are numbered in models
+        self.symbols = []
+        # the models of all sentences, None until they are needed
+        self.models = None
+
+        # sat engine state, built when the first query comes in
+        self.cnf = None
+        self.solver = None
+        # how many of cnf.clauses the solver has been given
+        self.given = 0
+
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        Sentence.validate(sentence)
+        self.sentences.append(sentence)
+        if self.engine == "sat":
+            if self.solver is not None:
+                self.cnf.add(sentence)
+            return
+        self.add_symbols(sentence.symbol_set())
+        if self.models is not None:
+            self.models &= self.mask(sentence)
+
+    def add_symbols(self, names):
+        """Numbers the symbols in names that are not known yet. A new symbol
+        is free in every model so far, so each model is kept with it true
+        and with it false."""
+        known = set(self.symbols)
+        for name in sorted(names):
+            if name in known:
+                continue
+            if self.models is not None:
+                self.models |= self.models << (1 << len(self.symbols))
+            self.symbols.append(name)
+
+    def mask(self, sentence):
+        """Returns an int with bit m set if model m makes sentence true."""
+        mask = 0
+        for first, part in Compiled(sentence, self.symbols).models():
+            mask |= part << first
+        return mask
+
+    def sentence(self):
+        """Returns the conjunction of all sentences."""
+        return And(*self.sentences)
+
+    def satisfiable(self):
+        """Returns True if the sentences can all be true together."""
+        if self.engine == "sat":
+            self.update_solver()
+            return self.solver.solve()
+        return self.all_models() != 0
+
+    def all_models(self):
+        """Returns the models of the knowledge base, finding them if the
+        sentences have not been narrowed down to them yet."""
+        if self.models is None:
+            self.models = self.mask(self.sentence())
+        return self.models
+
+    def update_solver(self):
+        """Gives the solver the clauses it has not seen yet."""
+        if self.solver is None:
+            self.cnf = sat.CNF()
+            self.solver = sat.Solver()
+            for sentence in self.sentences:
+                self.cnf.add(sentence)
+        for clause in self.cnf.clauses[self.given:]:
+            self.solver.add_clause(clause)
+        self.given = len(self.cnf.clauses)
+
+    def entails(self, query):
+        """Returns True if the knowledge base entails query."""
+        return self.entails_all([query])[0]
+
+    def entails_all(self, queries):
+        """Returns a list of whether the knowledge base entails each query,
+        reusing the models or solver for all of them."""
+        for query in queries:
+            Sentence.validate(query)
+
+        if self.engine == "sat":
+            self.update_solver()
+            # the definitions of the query literals go to the solver as well
+            literals = [self.cnf.literal(query) for query in queries]
+            self.update_solver()
+            return [not self.solver.solve([-literal]) for literal in literals]
+
+        # a query can mention symbols the knowledge base does not, it has
+        # to hold for every value of those too
+        for query in queries:
+            self.add_symbols(query.symbol_set())
+        models = self.all_models()
+        return [models & ~self.mask(query) == 0 for query in queries]
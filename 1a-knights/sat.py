@@ -0,0 +1,480 @@
+"""
+SAT solver backend for logic.py
+
+CNF turns Sentences into clauses with the Tseitin encoding: every And, Or,
+Implication and Biconditional gets a fresh variable that is made equivalent
+to it, so the clauses grow linearly with the sentence instead of blowing up
+like distributing Or over And would. Solver is a CDCL solver with unit
+propagation over two watched literals per clause, conflict clause learning
+and backjumping. Decisions take the most active variable from a heap, and
+the search restarts on the Luby schedule so that it does not get stuck
+deep in one part of the search space. On restarts the learnt clauses are
+cut back to the ones spanning the fewest decision levels, since every
+clause kept slows down propagation.
+
+Variables are positive integers and literals are signed variables, -v being
+the negation of v, like in the DIMACS format.
+"""
+
+import heapq
+
+import logic
+
+# conflicts before the first restart, later restarts wait a Luby multiple
+RESTART_BASE = 100
+
+# learnt clauses kept before the first reduction, at least, and how much
+# the limit grows after each reduction
+LEARNT_LIMIT = 1000
+LEARNT_GROWTH = 1.1
+
+
+class CNF():
+    """
+    Clauses of a set of sentences, in Tseitin form.
+    """
+
+    def __init__(self):
+        # maps symbol names to their variables
+        self.variables = {}
+        # maps sentences to the literal that stands for them
+        self.literals = {}
+        self.clauses = []
+        self.count = 0
+
+    def new_variable(self):
+        self.count += 1
+        return self.count
+
+    def variable(self, name):
+        """
+        Returns the variable of the symbol called name.
+        """
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+        return self.variables[name]
+
+    def add(self, sentence):
+        """
+        Adds clauses that are satisfied exactly when sentence is true.
+        """
+        # conjunctions at the top need no variable of their own
+        if isinstance(sentence, logic.And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to sentence, adding the clauses that
+        define it.
+        """
+        if isinstance(sentence, logic.Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, logic.Not):
+            return -self.literal(sentence.operand)
+
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        if isinstance(sentence, logic.And):
+            parts = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            v = self.new_variable()
+            # v => every conjunct, and all conjuncts => v
+            for part in parts:
+                self.clauses.append([-v, part])
+            self.clauses.append([v] + [-part for part in parts])
+        elif isinstance(sentence, (logic.Or, logic.Implication)):
+            if isinstance(sentence, logic.Or):
+                parts = [self.literal(disjunct)
+                         for disjunct in sentence.disjuncts]
+            else:
+                parts = [-self.literal(sentence.antecedent),
+                         self.literal(sentence.consequent)]
+            v = self.new_variable()
+            # any disjunct => v, and v => some disjunct
+            for part in parts:
+                self.clauses.append([v, -part])
+            self.clauses.append([-v] + parts)
+        elif isinstance(sentence, logic.Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            v = self.new_variable()
+            self.clauses.extend([
+                [-v, -left, right], [-v, left, -right],
+                [v, left, right], [v, -left, -right]
+            ])
+        else:
+            raise TypeError(f"cannot convert {sentence!r} to CNF")
+
+        self.literals[sentence] = v
+        return v
+
+
+class Solver():
+    """
+    CDCL SAT solver. Clauses can be added between calls to solve, and
+    clauses learnt in one call are kept for the next.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        # maps the indices of learnt clauses to the number of decision
+        # levels their literals had when they were learnt
+        self.learnt = {}
+        self.learnt_limit = LEARNT_LIMIT
+        # maps literals to the clauses watching them
+        self.watches = {}
+        # values[v] is 1 or -1 once v is assigned, 0 before
+        self.values = [0]
+        self.levels = [0]
+        # reasons[v] is the clause that forced v, None for decisions
+        self.reasons = [None]
+        self.activity = [0.0]
+        # (-activity, variable) entries, each unassigned variable has an
+        # entry with its current activity, outdated entries are skipped
+        self.heap = []
+        self.phases = [-1]
+        self.increment = 1.0
+        self.trail = []
+        # trail_limits[d] is where decision level d + 1 starts on the trail
+        self.trail_limits = []
+        self.head = 0
+        # False once the clauses alone are found unsatisfiable
+        self.ok = True
+
+    def grow(self, variable):
+        missing = variable + 1 - len(self.values)
+        if missing > 0:
+            for new in range(len(self.values), variable + 1):
+                heapq.heappush(self.heap, (0.0, new))
+            self.values.extend([0] * missing)
+            self.levels.extend([0] * missing)
+            self.reasons.extend([None] * missing)
+            self.activity.extend([0.0] * missing)
+            self.phases.extend([-1] * missing)
+
+    def value(self, literal):
+        """
+        Returns 1 if literal is true, -1 if false and 0 if unassigned.
+        """
+        value = self.values[abs(literal)]
+        return value if literal > 0 else -value
+
+    def add_clause(self, clause):
+        """
+        Adds a clause, a list of literals at least one of which must be true.
+        """
+        if not self.ok:
+            return
+        self.backtrack(0)
+        literals = []
+        for literal in clause:
+            self.grow(abs(literal))
+            value = self.value(literal)
+            if value == 1 or -literal in literals:
+                # already satisfied, or always true
+                return
+            if value == 0 and literal not in literals:
+                literals.append(literal)
+
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            if self.propagate() is not None:
+                self.ok = False
+        else:
+            self.attach(literals)
+
+    def attach(self, literals):
+        """
+        Stores a clause of two or more literals, watching the first two,
+        and returns its index.
+        """
+        index = len(self.clauses)
+        self.clauses.append(literals)
+        self.watches.setdefault(literals[0], []).append(index)
+        self.watches.setdefault(literals[1], []).append(index)
+        return index
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = 1 if literal > 0 else -1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assigns every literal forced by unit clauses, returns the index of a
+        clause left with every literal false, or None if there is none.
+        """
+        # value is inlined below, this loop is where the solver spends
+        # most of its time
+        values = self.values
+        clauses = self.clauses
+        watches = self.watches
+        trail = self.trail
+        while self.head < len(trail):
+            false_literal = -trail[self.head]
+            self.head += 1
+            watching = watches.get(false_literal, [])
+            kept = []
+            for position, index in enumerate(watching):
+                clause = clauses[index]
+                # keep the false watch in second place
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                first_value = values[first] if first > 0 else -values[-first]
+                if first_value == 1:
+                    kept.append(index)
+                    continue
+
+                # look for another literal to watch
+                for k in range(2, len(clause)):
+                    other = clause[k]
+                    if (values[other] if other > 0 else -values[-other]) != -1:
+                        clause[1], clause[k] = other, false_literal
+                        watches.setdefault(other, []).append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if first_value == -1:
+                        kept.extend(watching[position + 1:])
+                        watches[false_literal] = kept
+                        return index
+                    self.assign(first, index)
+            watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns (learnt clause, level to jump back to) for a conflict, the
+        learnt clause asserting the negation of the first unique implication
+        point in its first place.
+        """
+        level = len(self.trail_limits)
+        learnt = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        position = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for other in clause:
+                variable = abs(other)
+                if variable in seen or self.levels[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.levels[variable] == level:
+                    pending += 1
+                else:
+                    learnt.append(other)
+
+            # walk back to the latest assignment involved in the conflict
+            while abs(self.trail[position]) not in seen:
+                position -= 1
+            literal = self.trail[position]
+            position -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reasons[abs(literal)]]
+
+        # later conflicts count for more than earlier ones
+        self.increment *= 1.05
+        learnt[0] = -literal
+        if len(learnt) == 1:
+            return learnt, 0
+        # watch the literal that becomes unassigned last
+        deepest = max(range(1, len(learnt)),
+                      key=lambda k: self.levels[abs(learnt[k])])
+        learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+        return learnt, self.levels[abs(learnt[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, len(self.values))
+                         if self.values[v] == 0]
+            heapq.heapify(self.heap)
+        elif self.values[variable] == 0:
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def backtrack(self, level):
+        """
+        Undoes every assignment made above decision level level.
+        """
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phases[variable] = self.values[variable]
+            self.values[variable] = 0
+            self.reasons[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = min(self.head, start)
+
+    def reduce(self):
+        """
+        Drops the worse half of the learnt clauses, those spanning the most
+        decision levels, keeping any that span two or fewer. Only called at
+        decision level 0, where no clause is the reason for an assignment
+        analyze can reach.
+        """
+        ranked = sorted(self.learnt, key=lambda index: (
+            self.learnt[index], len(self.clauses[index])))
+        dropped = {index for index in ranked[len(ranked) // 2:]
+                   if self.learnt[index] > 2}
+
+        renumbered = {}
+        clauses = []
+        for index, clause in enumerate(self.clauses):
+            if index not in dropped:
+                renumbered[index] = len(clauses)
+                clauses.append(clause)
+        self.clauses = clauses
+        self.learnt = {renumbered[index]: levels
+                       for index, levels in self.learnt.items()
+                       if index not in dropped}
+
+        # every clause is watching its first two literals
+        self.watches = {}
+        for index, clause in enumerate(clauses):
+            self.watches.setdefault(clause[0], []).append(index)
+            self.watches.setdefault(clause[1], []).append(index)
+        for literal in self.trail:
+            self.reasons[abs(literal)] = None
+        self.learnt_limit *= LEARNT_GROWTH
+
+    def decide(self):
+        """
+        Returns the unassigned variable with the most activity, as a literal
+        with its last value, or None if every variable is assigned.
+        """
+        heap = self.heap
+        while heap:
+            activity, variable = heapq.heappop(heap)
+            if self.values[variable] == 0 \
+                    and -activity == self.activity[variable]:
+                return variable * self.phases[variable]
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses can all be satisfied with every literal
+        in assumptions true, False otherwise.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        for literal in assumptions:
+            self.grow(abs(literal))
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+
+        restarts = 0
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.trail_limits:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                levels = len({self.levels[abs(literal)] for literal in learnt})
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    index = self.attach(learnt)
+                    self.learnt[index] = levels
+                    self.assign(learnt[0], index)
+                conflicts += 1
+                if conflicts >= RESTART_BASE * luby(restarts):
+                    # activities and the best learnt clauses are kept, only
+                    # the decisions are undone
+                    restarts += 1
+                    conflicts = 0
+                    self.backtrack(0)
+                    if len(self.learnt) > self.learnt_limit:
+                        self.reduce()
+                continue
+
+            # assumptions are the first decisions
+            literal = None
+            while len(self.trail_limits) < len(assumptions):
+                assumption = assumptions[len(self.trail_limits)]
+                value = self.value(assumption)
+                if value == -1:
+                    return False
+                self.trail_limits.append(len(self.trail))
+                if value == 0:
+                    literal = assumption
+                    break
+            if literal is None:
+                literal = self.decide()
+                if literal is None:
+                    return True
+                self.trail_limits.append(len(self.trail))
+            self.assign(literal, None)
+
+    def model(self):
+        """
+        Returns the values of the last solution, indexed by variable.
+        """
+        return [value == 1 for value in self.values]
+
+
+def luby(index):
+    """
+    Returns term index (counting from 0) of the Luby sequence
+    1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    """
+    size = 1
+    exponent = 0
+    while size < index + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != index:
+        size = (size - 1) // 2
+        exponent -= 1
+        index %= size
+    return 2 ** exponent
+
+
+def satisfiable(sentence):
+    """
+    Returns True if some model makes sentence true.
+    """
+    cnf = CNF()
+    cnf.add(sentence)
+    solver = Solver()
+    for clause in cnf.clauses:
+        solver.add_clause(clause)
+    return solver.solve()
+
+
+def entails(knowledge, query):
+    """
+    Returns True if knowledge entails query, that is if knowledge and not
+    query cannot be true together.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    literal = cnf.literal(query)
+    solver = Solver()
+    for clause in cnf.clauses:
+        solver.add_clause(clause)
+    return not solver.solve([-literal])